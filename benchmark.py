@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+# Keep pygame's banner out of benchmark output
+os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
+
+import pygame
+from interface.stage import Stage
+from helpers.cell import Cell
+from helpers.profiler import Profiler
+from helpers.instrument import Instrument
+from helpers.scale import Scale
+
+# Measures how ticks scale with stage size, number of instruments and number of cells
+# Every configuration is run with fixed seeds, reports ticks per second, p50 / p99 tick latency and time spent in each
+# phase of a tick, and all results are written to a JSON file so that runs on different versions can be compared
+# Ticks are fired with Stage.next_tick, like a theater does, each phase being timed by a Profiler
+
+MOTIONS = ('UP', 'RIGHT', 'DOWN', 'LEFT')
+
+def build_stage(size, instruments, cells, engine, renderer, memoize, seed):
+    """
+    Build a stage with given number of instruments, each one already holding given number of cells
+    :param size: size in cells of stage
+    :param instruments: number of instruments
+    :param cells: number of cells of each instrument, also its maximum number of cells
+    :param engine: how cells are moved - None or 'vector'
+    :param renderer: how stage is drawn - None or 'array'
+    :param memoize: if True, stage replays cycles between births from records
+    :param seed: seed of random births and of initial cells
+    :return: a Stage object
+    """
+
+    stage = Stage(0, 0, 400, size, '127.0.0.1', 57120, seed=seed, engine=engine, renderer=renderer,
+                  memoize=memoize)
+    placement = random.Random(seed)
+    for number in range(instruments):
+        instrument = Instrument('bench%d' % number, cells, 0, 1, motion=MOTIONS[number % 4], color=(255, 255, 255))
+        instrument.set_scale(Scale('MAJOR', 36, size))
+
+        # Populations are filled at once, waiting for births would take too long on big stages
+        # Cells are placed where births may place them, lines and columns from 0 to size - 2
+        for _ in range(cells):
+            line = placement.randrange(0, size - 1)
+            col = placement.randrange(0, size - 1)
+            instrument.add_cell(Cell(line, col, placement.choice(MOTIONS)))
+        stage.add_instrument(instrument)
+    return stage
+
+def timed_tick(stage, profiler, render, osc, lookahead):
+    # Fire a tick of stage as a theater does, timing it as a whole, and draw stage if rendering is measured
+    # Phases of the tick are timed by stage itself with the same profiler
+
+    mark = profiler.start()
+    stage.next_tick(play=osc, timetag=time.time_ns() + lookahead if lookahead else None)
+    if render:
+        stage.draw()
+        update = profiler.start()
+        pygame.display.update(stage.get_dirty_rects())
+        profiler.add('update', update)
+    profiler.add('tick', mark)
+
+def run(size, instruments, cells, engine, renderer, memoize, lookahead, ticks, warmup, render, osc, seed, window):
+    """
+    Run a configuration and measure it
+    :return: a dictionary holding configuration and its measures
+    """
+
+    stage = build_stage(size, instruments, cells, engine, renderer, memoize, seed)
+    if render:
+        stage.set_theater(window)
+    profiler = Profiler(window=warmup)
+    stage.set_profiler(profiler, 'stage')
+    for _ in range(warmup):
+        timed_tick(stage, profiler, render, osc, lookahead)
+
+    # A new profiler keeps every measured tick
+    profiler = Profiler(window=ticks)
+    stage.set_profiler(profiler, 'stage')
+    start = time.perf_counter()
+    for _ in range(ticks):
+        timed_tick(stage, profiler, render, osc, lookahead)
+    total = time.perf_counter() - start
+    stats = profiler.get_stats()
+    tick = stats.pop('tick')
+    return {
+        'size': size,
+        'instruments': instruments,
+        'cells': cells,
+        'engine': engine or 'object',
+        'render': render,
+        'renderer': renderer or 'cells',
+        'memoize': memoize,
+        'lookahead': lookahead / 1000000000,
+        'osc': osc,
+        'seed': seed,
+        'ticks': ticks,
+        'ticks_per_second': ticks / total,
+        'p50_ms': tick['p50_ms'],
+        'p99_ms': tick['p99_ms'],
+        'max_ms': tick['max_ms'],
+        'phases': stats,
+    }
+
+def numbers(text):
+    # Parse a comma separated list of numbers
+
+    return [int(number) for number in text.split(',')]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark BoInG! ticks across stage sizes and populations')
+    parser.add_argument('--sizes', type=numbers, default=[8, 32, 64, 128], help='stage sizes, comma separated')
+    parser.add_argument('--instruments', type=numbers, default=[1, 4], help='numbers of instruments, comma separated')
+    parser.add_argument('--cells', type=numbers, default=[10, 100, 1000], help='cells per instrument, comma separated')
+    parser.add_argument('--engines', default='object,vector', help='engines to compare, comma separated')
+    parser.add_argument('--ticks', type=int, default=500, help='number of measured ticks per configuration')
+    parser.add_argument('--warmup', type=int, default=50, help='number of ticks run before measuring')
+    parser.add_argument('--seed', type=int, default=1, help='seed of every configuration')
+    parser.add_argument('--render', action='store_true', help='also measure with rendering on')
+    parser.add_argument('--renderer', choices=['array'], default=None, help='draw stages with the array renderer')
+    parser.add_argument('--memoize', action='store_true', help='replay cycles between births from records')
+    parser.add_argument('--lookahead', type=float, default=0.0, help='seconds ticks are computed ahead of time')
+    parser.add_argument('--osc', action='store_true', help='also send notes over OSC')
+    parser.add_argument('--output', default='bench_results.json', help='JSON file where to write results')
+    args = parser.parse_args()
+
+    # Rendering is measured in a hidden window when there is no display
+    window = None
+    if args.render:
+        if 'DISPLAY' not in os.environ and 'WAYLAND_DISPLAY' not in os.environ:
+            os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        pygame.init()
+        window = pygame.display.set_mode((400, 400))
+
+    results = []
+    print('%-6s %-6s %-11s %-6s %-8s %-7s %10s %9s %9s' % ('engine', 'size', 'instruments', 'cells', 'render', 'osc',
+                                                           'ticks/s', 'p50 ms', 'p99 ms'))
+    for engine in args.engines.split(','):
+        for size in args.sizes:
+            for instruments in args.instruments:
+                for cells in args.cells:
+                    for render in ([False, True] if args.render else [False]):
+                        result = run(size, instruments, cells, None if engine == 'object' else engine, args.renderer,
+                                     args.memoize, round(args.lookahead * 1000000000), args.ticks, args.warmup, render,
+                                     args.osc, args.seed, window)
+                        results.append(result)
+                        print('%-6s %-6d %-11d %-6d %-8s %-7s %10.0f %9.3f %9.3f' % (
+                            result['engine'], size, instruments, cells, render, result['osc'],
+                            result['ticks_per_second'], result['p50_ms'], result['p99_ms']))
+                        sys.stdout.flush()
+
+    # Write results with a description of the machine they were measured on
+    with open(args.output, 'w') as output:
+        json.dump({
+            'machine': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'processor': platform.processor(),
+                'pygame': pygame.version.ver,
+            },
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'results': results,
+        }, output, indent=2)
@@ -0,0 +1,82 @@
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+
+# Keep pygame's banner out of exploration output
+os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
+
+from main import build_stage, STAGE_SIZE
+
+# Runs the performance defined in main.py headless for many seeds, in a pool of processes, and scores every seed
+# Each stage owns its random generator, so a seed plays the same way whatever process runs it
+# Scores are note density (notes per tick), pitch spread (standard deviation of pitches), mean length of cycles the
+# stage falls in between births and collision rate (colliding cells per living cell and tick)
+
+SCORES = ('density', 'spread', 'cycle_length', 'collision_rate')
+
+def score_seed(task):
+    """
+    Run a seed headless and score it
+    :param task: a (seed, number of ticks, stage size, engine) tuple
+    :return: a dictionary holding seed and its scores
+    """
+
+    seed, ticks, size, engine = task
+    stage = build_stage(size, seed, engine, memoize=True)
+    pitches = []
+    cells = 0
+    collisions = 0
+    for tick in range(ticks):
+        for instrument, notes in stage.next_tick(play=False):
+            pitches.extend(notes)
+        _, _, _, collide, _ = stage.get_snapshot()
+        cells += len(collide)
+        collisions += int(collide.sum())
+    return {
+        'seed': seed,
+        'density': len(pitches) / ticks,
+        'spread': statistics.pstdev(pitches) if pitches else 0.0,
+        'cycle_length': stage.get_cycle_stats()['mean_cycle_length'],
+        'collision_rate': collisions / cells if cells else 0.0,
+    }
+
+def seeds(text):
+    # Parse a range of seeds given as first-last, or a single seed
+
+    first, _, last = text.partition('-')
+    return range(int(first), int(last or first) + 1)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Score many seeds of the BoInG! performance, in parallel')
+    parser.add_argument('seeds', type=seeds, help='seeds to explore, as first-last')
+    parser.add_argument('--ticks', type=int, default=2000, help='number of ticks run for each seed')
+    parser.add_argument('--size', type=int, default=STAGE_SIZE, help='number of cells in a border of the stage')
+    parser.add_argument('--engine', choices=['vector'], default=None, help='move cells with the vectorized engine')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--sort', choices=SCORES, default='density', help='score seeds are sorted by, best first')
+    parser.add_argument('--top', type=int, default=20, help='number of best seeds printed')
+    parser.add_argument('--output', default=None, help='JSON lines file where to write scores of all seeds')
+    args = parser.parse_args()
+
+    # Score all seeds, in any order, and write them as they come
+    results = []
+    output = None if args.output is None else open(args.output, 'w')
+    tasks = [(seed, args.ticks, args.size, args.engine) for seed in args.seeds]
+    with multiprocessing.Pool(args.workers) as pool:
+        for result in pool.imap_unordered(score_seed, tasks, chunksize=max(1, len(tasks) // (8 * args.workers))):
+            results.append(result)
+            if output is not None:
+                output.write(json.dumps(result) + '\n')
+    if output is not None:
+        output.close()
+
+    # Print best seeds
+    results.sort(key=lambda result: result[args.sort], reverse=True)
+    print('%-8s %10s %10s %13s %15s' % ('seed', 'density', 'spread', 'cycle_length', 'collision_rate'))
+    for result in results[:args.top]:
+        print('%-8d %10.3f %10.3f %13.1f %15.4f' % (result['seed'], result['density'], result['spread'],
+                                                     result['cycle_length'], result['collision_rate']))
+    sys.stdout.flush()
@@ -0,0 +1,82 @@
+import argparse
+import os
+import sys
+
+# Keep pygame's banner out of note output
+os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
+
+from interface.theater import Theater
+from helpers.profiler import Profiler
+from interface.midi_file import Midi_file
+from interface.nrt_score import Nrt_score
+from interface.recorder import Recorder, Recording
+from main import build_stage, THEATER_WIDTH, THEATER_HEIGHT, STAGE_SIZE, TEMPO, SEED
+
+# Runs the performance defined in main.py without any window nor tempo clock, as fast as possible
+# Every note message that would have been sent over OSC is written as a line: tick, stage, OSC URL and notes
+# Notes may also be exported to a Standard MIDI File or to a SuperCollider score rendered offline by sc/boing_nrt.scd
+# Performance may be recorded to a log, or read back from a log instead of being computed
+
+parser = argparse.ArgumentParser(description='Run a BoInG! performance headless, as fast as possible')
+parser.add_argument('ticks', type=int, nargs='?', default=None, help='number of ticks to run')
+parser.add_argument('--duration', type=float, default=None, help='run as many ticks as needed to last given seconds')
+parser.add_argument('--start', type=int, default=0, help='tick where to start, ticks before it are skipped at once')
+parser.add_argument('--size', type=int, default=STAGE_SIZE, help='number of cells in a border of the stage')
+parser.add_argument('--seed', type=int, default=SEED, help='seed of random births')
+parser.add_argument('--engine', choices=['vector'], default=None, help='move cells with the vectorized engine')
+parser.add_argument('--memoize', action='store_true', help='replay cycles of stage instead of computing them')
+parser.add_argument('--workers', type=int, default=0, help='advance stages in this number of worker processes')
+parser.add_argument('--profile', default=None, help='JSON lines file where to dump time spent in each phase of ticks')
+parser.add_argument('--osc', action='store_true', help='also send notes to OSC listener')
+parser.add_argument('--scsynth', action='store_true', help='send notes straight to SuperCollider server, with --osc')
+parser.add_argument('--output', default=None, help='file where to write notes, standard output if not given')
+parser.add_argument('--quiet', action='store_true', help='do not write notes, only run the performance')
+parser.add_argument('--midi', default=None, help='export notes to given Standard MIDI File')
+parser.add_argument('--nrt', default=None, help='export notes to given SuperCollider score')
+parser.add_argument('--record', default=None, help='record performance to given log, extended if it already exists')
+parser.add_argument('--replay', default=None, help='read performance from given log instead of computing it')
+args = parser.parse_args()
+if args.ticks is None and args.duration is None:
+    parser.error('give a number of ticks or a duration')
+if args.record and args.replay:
+    parser.error('a performance cannot be recorded while being replayed')
+
+# Prepare a theater without any window and put the stage on it
+profiler = None if args.profile is None else Profiler(path=args.profile)
+stage = build_stage(args.size, args.seed, args.engine, scsynth=args.scsynth, memoize=args.memoize)
+recorder = None if args.record is None else Recorder(args.record, [stage], TEMPO * (args.size - 1))
+replay = None if args.replay is None else Recording(args.replay)
+theater = Theater(THEATER_WIDTH, THEATER_HEIGHT, TEMPO * (args.size - 1), headless=True, workers=args.workers,
+                  profiler=profiler, recorder=recorder, replay=replay)
+theater.add_stage(stage)
+
+# Skip beginning of the piece if asked, an extended log going on after its last tick
+start = args.start if recorder is None else max(args.start, recorder.get_next_tick())
+theater.seek(start)
+
+# Prepare exports, tick time being derived from tempo
+ticks = args.ticks if args.ticks is not None else int(args.duration / theater.get_tick_duration())
+midi = Midi_file(TEMPO * (args.size - 1)) if args.midi else None
+nrt = Nrt_score(theater.get_tick_duration()) if args.nrt else None
+
+# Step all ticks and write note messages
+output = sys.stdout if args.output is None else open(args.output, 'w')
+for tick, stage, instrument, notes in theater.run(ticks, play=args.osc):
+    if not args.quiet:
+        output.write('%d %d /%s %s\n' % (start + tick, stage, instrument.get_name(), ' '.join(map(str, notes))))
+    if midi is not None:
+        midi.add_notes(tick, instrument.get_name(), notes)
+    if nrt is not None:
+        nrt.add_notes(tick, instrument.get_name(), notes)
+if output is not sys.stdout:
+    output.close()
+
+# Write exports and profile
+if profiler is not None:
+    profiler.dump()
+if recorder is not None:
+    recorder.close()
+if midi is not None:
+    midi.save(args.midi)
+if nrt is not None:
+    nrt.save(args.nrt)
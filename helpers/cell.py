@@ -4,41 +4,38 @@ class Cell:
     Cells are used in instruments to generate notes based on a sort of cellular automate kind of algorithm
     """
 
-    def __init__(self, line, col, motion):
+    # Cells are created by thousands on big stages, slots keep them small and fast to reach
+    __slots__ = ('_line', '_col', '_line_inc', '_col_inc', '_flash', '_collision', '_collide')
+
+    # Line and column increments for each motion label - unknown labels give a still cell
+    _motions = {
+        'UP': (-1, 0),
+        'DOWN': (1, 0),
+        'LEFT': (0, -1),
+        'RIGHT': (0, 1),
+    }
+
+    def __init__(self, line, col, motion, size=None):
         """
         Class constructor
         :param line: line where to place new cell
         :param col: column where to place new cell
         :param motion: direction where cell is going to - DOWN, LEFT, UP or RIGHT
+        :param size: instrument's size - if not given, collision number is only known after first move
         """
 
         # Saves class properties
         self._line = line
         self._col = col
 
-        # Compute mtion according to motion label
-        # L-
-        if motion == 'UP':
-            self._line_inc = -1
-            self._col_inc = 0
-        elif motion == 'DOWN':
-            self._line_inc = 1
-            self._col_inc = 0
-        elif motion == 'LEFT':
-            self._line_inc = 0
-            self._col_inc = -1
-        elif motion == 'RIGHT':
-            self._line_inc = 0
-            self._col_inc = 1
-        else:
-            self._line_inc = 0
-            self._col_inc = 0
+        # Compute motion according to motion label
+        self._line_inc, self._col_inc = self._motions.get(motion, (0, 0))
 
         # Tells when cell has to flash when hitting walls or collide
         self._flash = False
 
         # Used to find and display collisions
-        self._collision = 100 * line + col
+        self._collision = None if size is None else line * size + col
         self._collide = False
 
     def get_line(self):
@@ -65,11 +62,19 @@ class Cell:
 
         return self._flash
 
+    def get_increments(self):
+        """
+        Get cell's current line and column increments, telling where it goes at next move
+        :return: a (line increment, column increment) tuple
+        """
+
+        return self._line_inc, self._col_inc
+
     def get_collision(self):
         """
         Get cell's collision number
-        This number is set when moving cell and is addition of hundred times line number and column number
-        It gives a unique cell number for each line / column coordinate
+        This number is set when moving cell and is addition of instrument's size times line number and column number
+        It gives a unique cell number for each line / column coordinate, whatever the size of the instrument
         :return: collision number
         """
 
@@ -83,6 +88,23 @@ class Cell:
 
         return self._collide
 
+    def get_state(self):
+        """
+        Get cell's whole state, enough to set another cell in the very same state
+        :return: a (line, column, line increment, column increment, flash, collide) tuple
+        """
+
+        return self._line, self._col, self._line_inc, self._col_inc, self._flash, self._collide
+
+    def set_state(self, state):
+        """
+        Set cell's whole state, collision number is only known after next move
+        :param state: a (line, column, line increment, column increment, flash, collide) tuple, as given by get_state
+        """
+
+        self._line, self._col, self._line_inc, self._col_inc, self._flash, self._collide = state
+        self._collision = None
+
     def move(self, size):
         """
         Move cell according to its position, increments, instrument's boundaries and cell's current state
@@ -104,7 +126,7 @@ class Cell:
             self._col = size - 1
 
         # Compute collision number
-        self._collision = 100 * self._line + self._col
+        self._collision = self._line * size + self._col
 
         # Check if we have reached a low or high border
         if self._line_inc != 0:
@@ -125,6 +147,40 @@ class Cell:
         # Reset the collision flag as it has already be treated in previous cursor position
         self._collide = False
 
+    def skip(self, ticks, size):
+        """
+        Move cell a number of ticks at once, as long as it does not meet any other cell
+        Once a cell has bounced on a border, it goes back and forth with a period of twice instrument's size minus one,
+        so its position after any number of ticks is computed from its phase in this period
+        :param ticks: number of ticks
+        :param size: instrument's size
+        """
+
+        if ticks <= 0:
+            return
+
+        # First move brings cell inside instrument, moving away from a border it stands on
+        self.move(size)
+        ticks -= 1
+        if ticks == 0 or size < 2 or (self._line_inc == 0 and self._col_inc == 0):
+            return
+
+        # Phase counts steps since cell left first line or column, going forward then backward
+        period = 2 * (size - 1)
+        position, increment = (self._line, self._line_inc) if self._line_inc != 0 else (self._col, self._col_inc)
+        phase = (position if increment > 0 else period - position) + ticks
+        phase %= period
+        if phase < size - 1:
+            position, increment = phase, 1
+        else:
+            position, increment = period - phase, -1
+        if self._line_inc != 0:
+            self._line, self._line_inc = position, increment
+        else:
+            self._col, self._col_inc = position, increment
+        self._flash = position == 0 or position == size - 1
+        self._collision = self._line * size + self._col
+
     def collide(self):
         """
         Perform cell collision direction and state changes
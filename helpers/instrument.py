@@ -1,5 +1,6 @@
-from random import randrange
+from random import Random
 from .cell import Cell
+from .population import Population
 from .scale import Scale
 
 class Instrument:
@@ -8,6 +9,9 @@ class Instrument:
     An instrument needs to be put on stage to be able to play
     """
 
+    # Number of random draws tried for a newborn cell before picking it from free position index
+    _BIRTH_DRAWS = 16
+
     def __init__(self,  name, max_cells, first_birth, birth_rate, motion='UP', color=None):
         """
         Class constructor
@@ -25,77 +29,58 @@ class Instrument:
         self._birth_rate = birth_rate
         self._motion = motion
 
+        # Random generator used for births, an instrument put on a stage shares stage's generator
+        self._random = Random()
+
         # Saves cell's color or pick a random one if none has been given
-        if color == None:
-            self._color = (randrange(30, 225), randrange(30, 225), randrange(30, 225))
+        # A random color is picked again from stage's generator when instrument is put on a stage
+        self._random_color = color is None
+        if color is None:
+            self._color = self._pick_color()
         else:
             self._color = color
 
-        # A population contains a list of living cells
-        self._cells = []
+        # OSC listeners notes are sent to as (URL, port) tuples, stage's listener if None
+        self._destinations = None
+
+        # A population contains living cells, at most max_cells of them
+        self._cells = Population(max_cells)
 
         # Initialize population cursor
         # This cursor has to be reached to trigger a new cell birth
         self._cursor = first_birth
 
+    def _pick_color(self):
+        # Pick a random color, neither too dark nor too bright
+
+        return self._random.randrange(30, 225), self._random.randrange(30, 225), self._random.randrange(30, 225)
+
     def _move_cursor(self):
-        # Decrement cursor and check if it comes to zero
-        # In this case, a new cell has to raise and timer is reset for next cell birth
+        # Move population cursor and give birth to a new cell when it is time to
 
-        self._cursor -= 1
-        if self._cursor <= 0:
-            self._cursor = self._birth_rate
+        if self.count_down():
             self._add_cell()
 
     def _move_cells(self):
         # Move all cells making up the instrument
 
-        for cell in self._cells:
-            cell.move(self._size)
+        self._cells.move()
 
     def _check_collisions(self):
         # Check if some cells collide in cell's collection
+        # Population's occupancy grid tells which cells stand on a position shared with another one
 
-        # We go through entire collection, one by one
-        start = 0
-        for cell_1 in self._cells:
-
-            # And we check from current position against remaining cells in collection
-            start += 1
-            for cell_2 in self._cells[start:]:
-
-                # If two cells collide, we notify it
-                if cell_1.get_collision() == cell_2.get_collision():
-                    cell_1.collide()
-                    cell_2.collide()
-
-    def _remove_oldest_cell(self):
-        # Remove oldest cells as number of cells may not be greater than maximum authorized cells
-
-        self._cells = self._cells[1:]
+        for cell in self._cells.get_colliding():
+            cell.collide()
 
     def _add_cell(self):
         # Add a new cell to cell's collection
         # A cell may not appear on a spot already occupied by another cell
-        # If adding a cell to collection makes it bigger than maximum authorized size, remove oldest cell from collection
-
-        new_cell_ok = False
-        while not new_cell_ok:
-            line = randrange(0, self._size - 1)
-            col = randrange(0, self._size - 1)
-            if not self._cells:
-                new_cell_ok = True
-            else:
-                for cell in self._cells:
-                    if line == cell.get_line() and col == cell.get_col():
-                        new_cell_ok = False
-                        break
-                    else:
-                        new_cell_ok = True
-            if new_cell_ok:
-                self._cells.append(Cell(line, col, self._motion))
-        if len(self._cells) > self._max_cells:
-            self._remove_oldest_cell()
+        # If population is full, adding a cell to it expires oldest cell
+
+        position = self.pick_position(self._cells)
+        if position is not None:
+            self._cells.append(Cell(position[0], position[1], self._motion, self._size))
 
     def get_name(self):
         """
@@ -105,6 +90,189 @@ class Instrument:
 
         return self._name
 
+    def get_destinations(self):
+        """
+        Get OSC listeners instrument's notes are sent to
+        :return: a list of (URL, port) tuples, None if notes are sent to stage's listener
+        """
+
+        return self._destinations
+
+    def set_destinations(self, destinations):
+        """
+        Route instrument's notes to given OSC listeners instead of stage's listener
+        :param destinations: a list of (URL, port) tuples, None to send notes to stage's listener
+        """
+
+        self._destinations = None if destinations is None else list(destinations)
+
+    def get_max_cells(self):
+        """
+        Get maximum number of active cells that may be alive together
+        :return: maximum number of cells
+        """
+
+        return self._max_cells
+
+    def set_max_cells(self, max_cells):
+        """
+        Change maximum number of active cells that may be alive together, oldest cells expiring if there are too many
+        :param max_cells: maximum number of cells
+        """
+
+        self._max_cells = max_cells
+        self._cells.set_capacity(max_cells)
+
+    def get_birth_rate(self):
+        """
+        Get number of beats between each new birth of a new cell
+        Instrument must have been put on a stage
+        :return: number of beats
+        """
+
+        return self._birth_rate // (self._size - 1)
+
+    def set_birth_rate(self, birth_rate):
+        """
+        Change number of beats between each new birth of a new cell
+        Instrument must have been put on a stage - next birth comes sooner if it was due later than new rate allows
+        :param birth_rate: number of beats
+        """
+
+        self._birth_rate = birth_rate * (self._size - 1)
+        self._cursor = min(self._cursor, self._birth_rate)
+
+    def get_motion(self):
+        """
+        Get motion given to newborn cells
+        :return: motion label - DOWN, LEFT, UP or RIGHT
+        """
+
+        return self._motion
+
+    def count_down(self):
+        """
+        Decrement population cursor and tell if a new cell has to be born during this tick
+        When the cursor comes to zero, it is reset for next cell birth
+        :return: True if a new cell has to be born
+        """
+
+        self._cursor -= 1
+        if self._cursor <= 0:
+            self._cursor = self._birth_rate
+            return True
+        return False
+
+    def get_cursor(self):
+        """
+        Get population cursor, a new cell is born during the tick bringing it to zero
+        :return: number of ticks before next birth, counting tick of birth
+        """
+
+        return self._cursor
+
+    def skip_cursor(self, ticks):
+        """
+        Move population cursor by a number of ticks during which cells are not moved by instrument
+        No cell may be born during these ticks, they must be less than cursor
+        :param ticks: number of ticks
+        """
+
+        self._cursor -= ticks
+
+    def may_collide(self):
+        """
+        Tell if two living cells may ever meet, as long as no cell is born
+        Cells are moved on copies during a whole bouncing period, after which they all come back where they were
+        :return: True if two cells stand on a same position during a tick
+        """
+
+        probes = []
+        for cell in self._cells:
+            probe = Cell(0, 0, self._motion)
+            probe.set_state(cell.get_state())
+            probes.append(probe)
+        for tick in range(2 * (self._size - 1) + 1):
+            positions = set()
+            for probe in probes:
+                probe.move(self._size)
+                positions.add(probe.get_collision())
+            if len(positions) < len(probes):
+                return True
+        return False
+
+    def skip_cells(self, ticks):
+        """
+        Move cells a number of ticks at once, no cell being born during these ticks
+        Cells that never meet are moved at once, otherwise ticks are computed until cells come back in a state they
+        have already been in, and the rest of the ticks is skipped as whole cycles
+        :param ticks: number of ticks
+        """
+
+        if ticks <= 0 or len(self._cells) == 0:
+            return
+
+        # Cells move freely, each one bouncing on its own
+        if self._size > 1 and not self.may_collide():
+            cells = list(self._cells)
+            for cell in cells:
+                cell.skip(ticks, self._size)
+            self._cells.set_cells(cells)
+            return
+
+        # Cells meet, states are recorded until a cycle is found
+        states = {}
+        history = []
+        while ticks > 0:
+            state = self.get_state()
+            start = states.get(state)
+            if start is not None:
+                self.set_state(history[start + ticks % (len(history) - start)])
+                return
+            states[state] = len(history)
+            history.append(state)
+            self._move_cells()
+            self._check_collisions()
+            ticks -= 1
+
+    def fast_forward(self, ticks):
+        """
+        Advance instrument alone a number of ticks at once, without playing them
+        Ticks between births are skipped at once, ticks where a cell is born are computed as during a performance
+        Instruments of a stage are advanced together by Stage.fast_forward so that random births come in same order
+        :param ticks: number of ticks
+        """
+
+        while ticks > 0:
+            free = min(ticks, self._cursor - 1)
+            if free > 0:
+                self.skip_cells(free)
+                self.skip_cursor(free)
+                ticks -= free
+            else:
+                self.next_tick()
+                ticks -= 1
+
+    def pick_position(self, occupancy):
+        """
+        Pick a random position for a newborn cell, on a spot where no cell of the instrument stands
+        Position is drawn at random a few times, then picked at random from free positions if all draws were occupied
+        So that births take a bounded time even on nearly full grids
+        :param occupancy: an object telling where cells stand, like a Population, with is_occupied(line, col),
+                          count_free() and get_free(index) methods
+        :return: a (line, column) tuple, None if there is no free position left
+        """
+
+        for draw in range(self._BIRTH_DRAWS):
+            line = self._random.randrange(0, self._size - 1)
+            col = self._random.randrange(0, self._size - 1)
+            if not occupancy.is_occupied(line, col):
+                return line, col
+        free = occupancy.count_free()
+        if free == 0:
+            return None
+        return occupancy.get_free(self._random.randrange(free))
+
     def get_color(self, flash, collide):
         """
         Get instrument's color
@@ -120,17 +288,31 @@ class Instrument:
         else:
             return self._color
 
+    def set_random(self, random):
+        """
+        Set random generator used for births, picking a random color from it if no color has been given
+        Instruments of a stage share its generator, so that a stage plays the same way for a same seed whatever other
+        stages do
+        :param random: a random.Random object
+        """
+
+        self._random = random
+        if self._random_color:
+            self._color = self._pick_color()
+
     def set_color(self, color):
         """
         Set instrument's color
         :param color: instrument's color as a RGB triplet
         """
 
+        self._random_color = False
         self._color = color
 
     def add_cell(self, cell):
         """
         Add a cell to instrument
+        If instrument already holds its maximum number of cells, oldest cell expires
         :param cell: a Cell object
         """
 
@@ -138,12 +320,33 @@ class Instrument:
 
     def get_cells(self):
         """
-        Add a cell to instrument
-        :param cell: a Cell object
+        Get living cells of instrument
+        :return: a Population object, iterating on cells from oldest to youngest
         """
 
         return self._cells
 
+    def get_state(self):
+        """
+        Get state of all living cells, from oldest to youngest
+        :return: a tuple of cell states, as given by Cell.get_state
+        """
+
+        return tuple(cell.get_state() for cell in self._cells)
+
+    def set_state(self, state):
+        """
+        Replace all living cells by cells in given state
+        :param state: a tuple of cell states, as given by get_state
+        """
+
+        cells = []
+        for cell_state in state:
+            cell = Cell(0, 0, self._motion)
+            cell.set_state(cell_state)
+            cells.append(cell)
+        self._cells.set_cells(cells)
+
     def get_scale(self):
         """
         Get instrument's defined range from chosen scale
@@ -172,15 +375,27 @@ class Instrument:
         """
 
         self._size = size
+        self._cells.set_size(size)
 
         # cursor and birth rate have to be multiplie by size in cell to reflect real boundaries
         self._cursor *= (size - 1)
         self._birth_rate *= (size - 1)
 
-    def next_tick(self):
+    def next_tick(self, profiler=None, name=None):
         """
         Used to perform all actions during a tick relative to instrument
+        :param profiler: a Profiler object timing moves, births and collisions, if given
+        :param name: name prefixing phase names given to profiler
         """
-        self._move_cells()
-        self._move_cursor()
-        self._check_collisions()
\ No newline at end of file
+        if profiler is None:
+            self._move_cells()
+            self._move_cursor()
+            self._check_collisions()
+        else:
+            mark = profiler.start()
+            self._move_cells()
+            mark = profiler.add(name + '.move', mark)
+            self._move_cursor()
+            mark = profiler.add(name + '.cursor', mark)
+            self._check_collisions()
+            profiler.add(name + '.collisions', mark)
\ No newline at end of file
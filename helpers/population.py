@@ -0,0 +1,221 @@
+class Population:
+    """
+    Class that holds living cells of an instrument
+    Cells are kept in a fixed capacity ring buffer, in order of birth, so that adding a cell to a full population
+    expires the oldest one in constant time
+    An occupancy grid counts cells standing on each position of the instrument and a free position index, a Fenwick tree
+    over free birth positions, finds where a new cell may be born in a number of steps growing with the logarithm of the
+    number of positions, never scanning living cells nor positions
+    """
+
+    def __init__(self, capacity):
+        """
+        Class constructor
+        :param capacity: maximum number of cells that may be alive together
+        """
+
+        # Ring buffer of cells - head is the slot of oldest cell, count the number of living cells
+        # Collision number of each cell is kept in a parallel ring to update occupancy grid when it moves
+        self._capacity = capacity
+        self._cells = [None] * capacity
+        self._keys = [None] * capacity
+        self._head = 0
+        self._count = 0
+
+        # Occupancy grid is only built once size is known
+        self._size = None
+        self._occupancy = []
+        self._tree = []
+        self._free = 0
+
+    def __iter__(self):
+        # Iterate over living cells, from oldest to youngest
+
+        for slot in self._slots():
+            yield self._cells[slot]
+
+    def __len__(self):
+        return self._count
+
+    def _slots(self):
+        # Get ring slots of living cells, from oldest to youngest
+
+        end = self._head + self._count
+        if end <= self._capacity:
+            return range(self._head, end)
+        return list(range(self._head, self._capacity)) + list(range(0, end - self._capacity))
+
+    def _update_free(self, key, delta):
+        # Add delta to number of free positions at position given by its collision number, if it is a birth position
+        # Birth positions are lines and columns from 0 to size - 2, the ones a random birth may pick, numbered line by
+        # line from 1 in free position index
+
+        line, col = divmod(key, self._size)
+        if line < self._size - 1 and col < self._size - 1:
+            self._free += delta
+            tree = self._tree
+            position = line * (self._size - 1) + col + 1
+            while position < len(tree):
+                tree[position] += delta
+                position += position & -position
+
+    def _occupy(self, key):
+        # Count one more cell on position given by its collision number
+
+        if self._occupancy[key] == 0:
+            self._update_free(key, -1)
+        self._occupancy[key] += 1
+
+    def _release(self, key):
+        # Count one less cell on position given by its collision number
+
+        self._occupancy[key] -= 1
+        if self._occupancy[key] == 0:
+            self._update_free(key, 1)
+
+    def _key(self, cell):
+        # Compute collision number of a cell from its position
+
+        return cell.get_line() * self._size + cell.get_col()
+
+    def _rebuild(self, cells):
+        # Rebuild ring buffer, occupancy grid and free position index from a list of cells sorted from oldest to youngest
+        # Only the youngest cells are kept if there are more than population's capacity
+
+        cells = cells[max(0, len(cells) - self._capacity):]
+        self._cells = cells + [None] * (self._capacity - len(cells))
+        self._keys = [None] * self._capacity
+        self._head = 0
+        self._count = len(cells)
+        if self._size is not None:
+            self._occupancy = [0] * (self._size * self._size)
+            self._free = (self._size - 1) * (self._size - 1)
+
+            # Every birth position is free at first, so each node of free position index counts the positions it covers
+            self._tree = [position & -position for position in range(self._free + 1)]
+            for slot, cell in enumerate(cells):
+                self._keys[slot] = self._key(cell)
+                self._occupy(self._keys[slot])
+
+    def set_size(self, size):
+        """
+        Set size in cells of instrument holding this population and rebuild occupancy grid accordingly
+        :param size: size in cells
+        """
+
+        self._size = size
+        self._rebuild(list(self))
+
+    def set_capacity(self, capacity):
+        """
+        Change maximum number of cells that may be alive together
+        If population is bigger than new capacity, oldest cells are removed
+        :param capacity: maximum number of cells
+        """
+
+        cells = list(self)
+        self._capacity = capacity
+        self._rebuild(cells)
+
+    def set_cells(self, cells):
+        """
+        Replace all living cells
+        :param cells: a list of Cell objects, sorted from oldest to youngest
+        """
+
+        self._rebuild(list(cells))
+
+    def append(self, cell):
+        """
+        Add a new cell as youngest of population
+        If population is full, oldest cell expires to make room for new one
+        :param cell: a Cell object
+        :return: expired cell if any, None otherwise
+        """
+
+        # A population without any room expires its newborn cells at once
+        if self._capacity == 0:
+            return cell
+
+        # Expire oldest cell if population is full
+        expired = None
+        if self._count == self._capacity:
+            expired = self._cells[self._head]
+            if self._size is not None:
+                self._release(self._keys[self._head])
+            self._cells[self._head] = None
+            self._head = (self._head + 1) % self._capacity
+            self._count -= 1
+
+        # Store new cell in first free slot after youngest one
+        slot = (self._head + self._count) % self._capacity
+        self._cells[slot] = cell
+        if self._size is not None:
+            self._keys[slot] = self._key(cell)
+            self._occupy(self._keys[slot])
+        self._count += 1
+        return expired
+
+    def move(self):
+        """
+        Move all cells of population and keep occupancy grid up to date
+        """
+
+        size = self._size
+        cells = self._cells
+        keys = self._keys
+        for slot in self._slots():
+            cell = cells[slot]
+            cell.move(size)
+            key = cell.get_collision()
+            if key != keys[slot]:
+                self._release(keys[slot])
+                self._occupy(key)
+                keys[slot] = key
+
+    def get_colliding(self):
+        """
+        Get cells standing on a position shared with at least another cell of population
+        :return: an iterator on Cell objects, from oldest to youngest
+        """
+
+        occupancy = self._occupancy
+        for slot in self._slots():
+            if occupancy[self._keys[slot]] > 1:
+                yield self._cells[slot]
+
+    def is_occupied(self, line, col):
+        """
+        Tell if a cell of population stands at given line and column
+        :param line: line number
+        :param col: column number
+        :return: True if position is occupied
+        """
+
+        return self._occupancy[line * self._size + col] > 0
+
+    def count_free(self):
+        """
+        Get number of free birth positions, lines and columns from 0 to size - 2 where no cell stands
+        :return: number of free birth positions
+        """
+
+        return self._free
+
+    def get_free(self, index):
+        """
+        Get a free birth position by giving its index among all free birth positions, sorted by line then column
+        Free position index is walked down from its highest power of two, so this costs about log2(size * size) steps
+        :param index: index of free position, from 0 to number of free positions - 1
+        :return: a (line, column) tuple
+        """
+
+        tree = self._tree
+        position = 0
+        step = 1 << (len(tree) - 1).bit_length()
+        while step:
+            if position + step < len(tree) and tree[position + step] <= index:
+                position += step
+                index -= tree[position]
+            step >>= 1
+        return divmod(position, self._size - 1)
@@ -0,0 +1,89 @@
+import json
+from collections import deque
+from time import perf_counter_ns, time
+
+class Profiler:
+    """
+    Class used to time phases of ticks and frames - moves, collisions, drawing, OSC sending...
+    Durations of last calls of each phase are kept in rolling windows, giving their median, 99th percentile and maximum
+    Timing a phase only costs two clock reads, statistics are only computed when asked for
+    """
+
+    def __init__(self, window=1000, path=None, interval=10.0):
+        """
+        Class constructor
+        :param window: number of last durations kept for each phase
+        :param path: JSON lines file where statistics are periodically appended, never dumped if not given
+        :param interval: in seconds - time between two dumps
+        """
+
+        # Store class properties
+        self._window = window
+        self._path = path
+        self._interval = interval
+
+        # Last durations of each phase in nanoseconds, by phase name, in order phases have first been timed
+        self._durations = {}
+
+        # Time of next dump
+        self._next_dump = time() + interval
+
+    def start(self):
+        """
+        Start timing a phase
+        :return: a mark to give to add when phase is over
+        """
+
+        return perf_counter_ns()
+
+    def add(self, name, mark):
+        """
+        Stop timing a phase and keep its duration
+        :param name: phase name, like stage0.xylophone.move
+        :param mark: mark given by start, or by add for a phase following another one
+        :return: a mark to time next phase from now on
+        """
+
+        now = perf_counter_ns()
+        durations = self._durations.get(name)
+        if durations is None:
+            durations = self._durations[name] = deque(maxlen=self._window)
+        durations.append(now - mark)
+        return now
+
+    def get_stats(self):
+        """
+        Get statistics of all phases over their rolling windows
+        :return: a dictionary giving, by phase name, number of calls kept, median, 99th percentile and maximum duration
+                 in milliseconds
+        """
+
+        stats = {}
+        for name, durations in self._durations.items():
+            values = sorted(durations)
+            stats[name] = {
+                'count': len(values),
+                'p50_ms': values[len(values) // 2] / 1000000,
+                'p99_ms': values[min(len(values) - 1, int(0.99 * len(values)))] / 1000000,
+                'max_ms': values[-1] / 1000000,
+            }
+        return stats
+
+    def dump(self):
+        """
+        Append statistics of all phases to dump file, as a single JSON line stamped with current Unix time
+        """
+
+        if self._path is not None:
+            with open(self._path, 'a') as dump_file:
+                dump_file.write(json.dumps({'time': time(), 'phases': self.get_stats()}) + '\n')
+
+    def poll(self):
+        """
+        Dump statistics if it is time to
+        """
+
+        now = time()
+        if now >= self._next_dump:
+            self._next_dump = now + self._interval
+            self.dump()
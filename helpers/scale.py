@@ -148,6 +148,37 @@ class Scale:
         """
         return self._scale
 
+    def get_name(self):
+        """
+        Get name of base scale used to define range
+        :return: name of base scale
+        """
+        return self._name
+
+    def set_name(self, name):
+        """
+        Change base scale used to define range, keeping starting note
+        :param name: name of base scale
+        """
+        self._name = name
+        self._scale = self.set_scale(name, self._base, self._size)
+
+    def get_base(self):
+        """
+        Get starting note of range
+        :return: starting note as a midi note number
+        """
+        return self._base
+
+    def set_base(self, base):
+        """
+        Change starting note of range, all notes of range being shifted by same interval
+        :param base: starting note as a midi note number
+        """
+        shift = base - self._base
+        self._base = base
+        self._scale = [note + shift for note in self._scale]
+
     def set_scale(self, name, base, size):
         """
         Setes instrument's range
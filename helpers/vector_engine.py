@@ -0,0 +1,340 @@
+import numpy as np
+from .cell import Cell
+
+class Occupancy_grid:
+    """
+    Class that tells where cells of an instrument stand, from a boolean NumPy grid
+    It is used to pick positions of newborn cells the same way as instrument's population does
+    """
+
+    def __init__(self, size, lines, cols):
+        """
+        Class constructor
+        :param size: size in cells of stage
+        :param lines: lines of instrument's cells as a NumPy array
+        :param cols: columns of instrument's cells as a NumPy array
+        """
+
+        self._grid = np.zeros((size, size), dtype=bool)
+        self._grid[lines, cols] = True
+
+        # Free birth positions are only computed if really needed
+        self._free = None
+
+    def _get_free(self):
+        # Get free birth positions, lines and columns from 0 to size - 2 where no cell stands, sorted by line then column
+
+        if self._free is None:
+            self._free = np.argwhere(~self._grid[:-1, :-1])
+        return self._free
+
+    def is_occupied(self, line, col):
+        """
+        Tell if a cell stands at given line and column
+        :param line: line number
+        :param col: column number
+        :return: True if position is occupied
+        """
+
+        return bool(self._grid[line, col])
+
+    def count_free(self):
+        """
+        Get number of free birth positions
+        :return: number of free birth positions
+        """
+
+        return len(self._get_free())
+
+    def get_free(self, index):
+        """
+        Get a free birth position by giving its index among all free birth positions, sorted by line then column
+        :param index: index of free position
+        :return: a (line, column) tuple
+        """
+
+        line, col = self._get_free()[index].tolist()
+        return line, col
+
+
+class Vector_engine:
+    """
+    Class that moves all cells of all instruments of a stage in batched operations
+    Instead of Cell objects, cells are kept as columns of NumPy arrays (line, column, increments, flags, instrument)
+    Instruments still hold their configuration (scale, color, birth cursor) and the random births, so that for a same
+    seed this engine plays exactly the same notes as the Instrument / Cell reference path
+    """
+
+    def __init__(self, size):
+        """
+        Class constructor
+        :param size: size in cells of stage
+        """
+
+        # Store class properties
+        self._size = size
+
+        # Store different instruments driven by this engine, their index is the instrument id of their cells
+        self._instruments = []
+
+        # Cells of all instruments, one entry per cell, in order of birth
+        # Keeping order of birth gives oldest cell of an instrument first, as in the reference path
+        self._line = np.empty(0, dtype=np.int64)
+        self._col = np.empty(0, dtype=np.int64)
+        self._line_inc = np.empty(0, dtype=np.int64)
+        self._col_inc = np.empty(0, dtype=np.int64)
+        self._flash = np.empty(0, dtype=bool)
+        self._collide = np.empty(0, dtype=bool)
+        self._instrument = np.empty(0, dtype=np.int64)
+
+    def _move_cells(self):
+        # Move all cells at once, bounce those reaching a border and flag them as flashing
+
+        size = self._size
+
+        # Compute new line and column positions, keeping newborn cells on the border inside the stage
+        self._line += self._line_inc
+        self._col += self._col_inc
+        np.clip(self._line, 0, size - 1, out=self._line)
+        np.clip(self._col, 0, size - 1, out=self._col)
+
+        # Check if we have reached a low or high border for vertical moves, a left or right one for horizontal moves
+        vertical = self._line_inc != 0
+        horizontal = ~vertical & (self._col_inc != 0)
+        line_border = vertical & ((self._line == 0) | (self._line == size - 1))
+        col_border = horizontal & ((self._col == 0) | (self._col == size - 1))
+        np.negative(self._line_inc, out=self._line_inc, where=line_border)
+        np.negative(self._col_inc, out=self._col_inc, where=col_border)
+
+        # Still cells keep their flashing state, as in the reference path
+        self._flash = np.where(vertical | horizontal, line_border | col_border, self._flash)
+
+        # Reset the collision flags as they have already been treated in previous cursor position
+        self._collide[:] = False
+
+    def _add_cells(self):
+        # Move birth cursors of all instruments and give birth to new cells when it is time to
+        # Instruments are treated in the same order as in the reference path so that random draws come in same order
+
+        for id, instrument in enumerate(self._instruments):
+            if instrument.count_down():
+
+                # A cell may not appear on a spot already occupied by another cell of the same instrument
+                own = self._instrument == id
+                position = instrument.pick_position(Occupancy_grid(self._size, self._line[own], self._col[own]))
+                if position is None:
+                    continue
+                line_inc, col_inc = Cell(position[0], position[1], instrument.get_motion()).get_increments()
+                self._append(position[0], position[1], line_inc, col_inc, id)
+
+                # Remove oldest cells of this instrument if it now has too many
+                own = np.flatnonzero(self._instrument == id)
+                if len(own) > instrument.get_max_cells():
+                    self._remove(own[:len(own) - instrument.get_max_cells()])
+
+    def _check_collisions(self):
+        # Find cells of a same instrument sharing a same position and make them change direction
+        # Flashing cells do not change direction because of wrong behaviour at boundaries, especially in corners
+
+        # Give a unique key to each instrument / line / column combination and count cells per key
+        keys = (self._instrument * self._size + self._line) * self._size + self._col
+        _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        collide = (counts[inverse] > 1) & ~self._flash
+
+        # Change direction of colliding cells, vertical moves become horizontal ones and vice versa
+        vertical = self._line_inc != 0
+        line_inc = np.where(vertical, 0, self._col_inc)
+        col_inc = np.where(vertical, self._line_inc, 0)
+        self._line_inc = np.where(collide, line_inc, self._line_inc)
+        self._col_inc = np.where(collide, col_inc, self._col_inc)
+
+        # Set the collision flags for display
+        self._collide = collide
+
+    def _may_collide(self):
+        # Tell if two cells of a same instrument may ever meet, as long as no cell is born
+        # Cells are moved during a whole bouncing period, after which they all come back where they were, then restored
+
+        state = self.get_state()
+        collide = False
+        for tick in range(2 * (self._size - 1) + 1):
+            self._move_cells()
+            keys = (self._instrument * self._size + self._line) * self._size + self._col
+            if len(np.unique(keys)) < len(keys):
+                collide = True
+                break
+        self.set_state(state)
+        return collide
+
+    def _bounce(self, ticks):
+        # Move cells that never meet a number of ticks at once
+        # After first move, each cell goes back and forth with a period of twice stage's size minus one, so its position
+        # is computed from its phase in this period
+
+        self._move_cells()
+        ticks -= 1
+        if ticks == 0:
+            return
+        size = self._size
+        period = 2 * (size - 1)
+        for position, increment in ((self._line, self._line_inc), (self._col, self._col_inc)):
+            moving = increment != 0
+            phase = (np.where(increment > 0, position, period - position) + ticks) % period
+            forward = phase < size - 1
+            np.copyto(position, np.where(forward, phase, period - phase), where=moving)
+            np.copyto(increment, np.where(forward, 1, -1), where=moving)
+
+        # Cells standing on a border after last move are flashing, still cells keep their flashing state
+        vertical = self._line_inc != 0
+        horizontal = ~vertical & (self._col_inc != 0)
+        line_border = vertical & ((self._line == 0) | (self._line == size - 1))
+        col_border = horizontal & ((self._col == 0) | (self._col == size - 1))
+        self._flash = np.where(vertical | horizontal, line_border | col_border, self._flash)
+
+    def _append(self, line, col, line_inc, col_inc, id):
+        # Add a new cell at the end of arrays, a newborn cell neither flashes nor collides
+
+        self._line = np.append(self._line, line)
+        self._col = np.append(self._col, col)
+        self._line_inc = np.append(self._line_inc, line_inc)
+        self._col_inc = np.append(self._col_inc, col_inc)
+        self._flash = np.append(self._flash, False)
+        self._collide = np.append(self._collide, False)
+        self._instrument = np.append(self._instrument, id)
+
+    def _remove(self, index):
+        # Remove cell at given index from arrays
+
+        self._line = np.delete(self._line, index)
+        self._col = np.delete(self._col, index)
+        self._line_inc = np.delete(self._line_inc, index)
+        self._col_inc = np.delete(self._col_inc, index)
+        self._flash = np.delete(self._flash, index)
+        self._collide = np.delete(self._collide, index)
+        self._instrument = np.delete(self._instrument, index)
+
+    def add_instrument(self, instrument):
+        """
+        Add an instrument to engine
+        Instrument must already have been sized to stage, cells it already holds are taken over by the engine
+        :param instrument: an Instrument object
+        """
+
+        id = len(self._instruments)
+        self._instruments.append(instrument)
+        for cell in instrument.get_cells():
+            line_inc, col_inc = cell.get_increments()
+            self._append(cell.get_line(), cell.get_col(), line_inc, col_inc, id)
+
+    def trim(self, instrument):
+        """
+        Remove oldest cells of an instrument if it has more cells than its maximum, once its maximum has been lowered
+        :param instrument: an Instrument object driven by engine
+        """
+
+        id = self._instruments.index(instrument)
+        own = np.flatnonzero(self._instrument == id)
+        if len(own) > instrument.get_max_cells():
+            self._remove(own[:len(own) - instrument.get_max_cells()])
+
+    def get_arrays(self):
+        """
+        Get cells of all instruments as NumPy arrays, one entry per cell
+        :return: a (line, column, line increment, column increment, flash, collide, instrument id) tuple of arrays
+        """
+
+        return self._line, self._col, self._line_inc, self._col_inc, self._flash, self._collide, self._instrument
+
+    def skip(self, ticks):
+        """
+        Move cells a number of ticks at once, no cell being born during these ticks
+        Cells that never meet are moved at once, otherwise ticks are computed until cells come back in a state they
+        have already been in, and the rest of the ticks is skipped as whole cycles
+        Birth cursors of instruments are left untouched
+        :param ticks: number of ticks
+        """
+
+        if ticks <= 0 or len(self._line) == 0:
+            return
+
+        # Cells move freely, each one bouncing on its own
+        if self._size > 1 and not self._may_collide():
+            self._bounce(ticks)
+            return
+
+        # Cells meet, states are recorded until a cycle is found
+        states = {}
+        history = []
+        while ticks > 0:
+            state = self.get_state()
+            key = b''.join(array.tobytes() for array in state)
+            start = states.get(key)
+            if start is not None:
+                self.set_state(history[start + ticks % (len(history) - start)])
+                return
+            states[key] = len(history)
+            history.append(state)
+            self._move_cells()
+            self._check_collisions()
+            ticks -= 1
+
+    def get_state(self):
+        """
+        Get a copy of cells of all instruments, enough to set engine back in the very same state
+        :return: a tuple of arrays, as given by get_arrays
+        """
+
+        return tuple(array.copy() for array in self.get_arrays())
+
+    def set_state(self, state):
+        """
+        Set cells of all instruments
+        :param state: a tuple of arrays, as given by get_state
+        """
+
+        (self._line, self._col, self._line_inc, self._col_inc, self._flash, self._collide,
+         self._instrument) = (array.copy() for array in state)
+
+    def get_notes(self):
+        """
+        Get notes to be played by each instrument during this tick
+        An instrument is only playing when one of its moving cell has reached a border (is so called flashing)
+        Note played is picked from instrument's scale at position line + column
+        :return: a list of (instrument, notes) tuples, only for instruments having notes to play
+        """
+
+        # Only look at flashing cells, sorted by instrument while keeping their order of birth
+        flashing = np.flatnonzero(self._flash)
+        flashing = flashing[np.argsort(self._instrument[flashing], kind='stable')]
+        ids = self._instrument[flashing]
+        indices = (self._line[flashing] + self._col[flashing]).tolist()
+
+        # Split indices per instrument and pick notes from scales
+        notes = []
+        bounds = np.flatnonzero(np.diff(ids)) + 1
+        for start, end in zip([0] + bounds.tolist(), bounds.tolist() + [len(indices)]):
+            if start < end:
+                instrument = self._instruments[ids[start]]
+                scale = instrument.get_scale()
+                notes.append((instrument, [scale.get_note(index) for index in indices[start:end]]))
+        return notes
+
+    def next_tick(self, profiler=None, name=None):
+        """
+        Used to perform all actions during a tick for all instruments at once
+        :param profiler: a Profiler object timing moves, births and collisions, if given
+        :param name: name prefixing phase names given to profiler
+        """
+
+        if profiler is None:
+            self._move_cells()
+            self._add_cells()
+            self._check_collisions()
+        else:
+            mark = profiler.start()
+            self._move_cells()
+            mark = profiler.add(name + '.move', mark)
+            self._add_cells()
+            mark = profiler.add(name + '.cursor', mark)
+            self._check_collisions()
+            profiler.add(name + '.collisions', mark)
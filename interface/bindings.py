@@ -0,0 +1,170 @@
+from .lpd8 import LPD8_Events
+
+class Bindings:
+    """
+    Class used to bind LPD8 knobs and pads to parameters of a performance while playing - tempo of theater, and birth
+    rate, maximum number of cells, scale and base note of instruments
+    Controller events only keep values asked for, all changes being applied at once at start of next tick, never in the
+    middle of a tick - theater reads events once per frame at least, before firing due ticks, so a change is heard one
+    frame and one tick later at most, plus lookahead when ticks are computed ahead of time
+    A knob may be smoothed, its parameter then moving part of the way toward value asked for at each tick
+    """
+
+    # Parameters that may be bound, by name, telling if their values are whole numbers
+    _PARAMETERS = {
+        'tempo': False,
+        'birth_rate': True,
+        'max_cells': True,
+        'scale': False,
+        'base': True,
+    }
+
+    # Highest knob value
+    _KNOB_STEPS = 127
+
+    def __init__(self):
+        """
+        Class constructor
+        """
+
+        # Bindings by (event type, program, bank, knob or note number), as dispatch table from controller to parameters
+        # Each binding is a (target, low, high, choices, smoothing) tuple for a knob, a (target, value) tuple for a pad,
+        # target being a (stage number, instrument number, parameter) tuple, stage and instrument being None for tempo
+        self._bindings = {}
+
+        # Values asked for and not reached yet, with their smoothing, by target
+        self._pending = {}
+
+        # Number of controller events bound and of changes applied
+        self._events = 0
+        self._changes = 0
+
+    def _get_target(self, parameter, stage, instrument):
+        # Get target of a binding, checking parameter may be bound
+
+        if parameter not in self._PARAMETERS:
+            raise ValueError('Unknown parameter %s' % parameter)
+        if parameter == 'tempo':
+            return None, None, parameter
+        return stage, instrument, parameter
+
+    def _get_value(self, theater, target):
+        # Get current value of a target
+
+        stage, instrument, parameter = target
+        if parameter == 'tempo':
+            return theater.get_tempo()
+        return theater.get_stages()[stage].get_parameter(instrument, parameter)
+
+    def _smooth(self, parameter, current, value, smoothing):
+        # Move a value part of the way toward value asked for, whole numbers moving by one at least
+        # Returns next value
+
+        step = current + (value - current) * (1 - smoothing)
+        if self._PARAMETERS[parameter]:
+            step = round(step)
+            if step == current:
+                step = current + (1 if value > current else -1)
+        elif abs(value - step) < 0.5:
+            step = value
+        return step
+
+    def bind_knob(self, program, bank, knob, parameter, low=0, high=127, stage=0, instrument=0, choices=None,
+                  smoothing=0.0):
+        """
+        Bind a knob to a parameter, knob range being spread between two values
+        :param program: program of LPD8, from 0 to 3
+        :param bank: bank of LPD8, from 0 to 7
+        :param knob: knob number, from 1 to 8
+        :param parameter: tempo (ticks per minute), birth_rate (beats between births), max_cells (maximum number of
+                          cells), scale (name of base scale) or base (starting note of scale)
+        :param low: value of parameter when knob is turned down
+        :param high: value of parameter when knob is turned up
+        :param stage: number of stage of instrument, in order stages have been added to theater
+        :param instrument: number of instrument, in order instruments have been added to stage
+        :param choices: a list of values knob range is split between, low and high being left apart - like scale names
+        :param smoothing: from 0 to 1, part of the way left to go at each tick - 0 reaches value at once
+        """
+
+        self._bindings[(LPD8_Events.LPD8_CTRL, program, bank, knob)] = (
+            self._get_target(parameter, stage, instrument), low, high, choices, smoothing)
+
+    def bind_pad(self, program, bank, note, parameter, value, stage=0, instrument=0):
+        """
+        Bind a pad to a parameter, hitting pad setting parameter to a value
+        :param program: program of LPD8, from 0 to 3
+        :param bank: bank of LPD8, from 0 to 7
+        :param note: note number sent by pad
+        :param parameter: tempo, birth_rate, max_cells, scale or base - see bind_knob
+        :param value: value of parameter
+        :param stage: number of stage of instrument, in order stages have been added to theater
+        :param instrument: number of instrument, in order instruments have been added to stage
+        """
+
+        self._bindings[(LPD8_Events.LPD8_NOTE_ON, program, bank, note)] = (
+            self._get_target(parameter, stage, instrument), value)
+
+    def handle(self, event):
+        """
+        Keep value asked for by a controller event, if it is bound - a later event for same parameter replaces it
+        :param event: a pygame event
+        :return: True if event is bound to a parameter
+        """
+
+        if event.type == LPD8_Events.LPD8_CTRL:
+            binding = self._bindings.get((event.type, event.pgm, event.bank, event.ctrl))
+            if binding is None:
+                return False
+            target, low, high, choices, smoothing = binding
+            if choices is not None:
+                value = choices[min(len(choices) - 1, event.value * len(choices) // (self._KNOB_STEPS + 1))]
+                smoothing = 0.0
+            else:
+                value = low + (high - low) * event.value / self._KNOB_STEPS
+                if self._PARAMETERS[target[2]]:
+                    value = round(value)
+        elif event.type == LPD8_Events.LPD8_NOTE_ON:
+            binding = self._bindings.get((event.type, event.pgm, event.bank, event.note))
+            if binding is None:
+                return False
+            target, value = binding
+            smoothing = 0.0
+        else:
+            return False
+        self._pending[target] = (value, smoothing)
+        self._events += 1
+        return True
+
+    def get_changes(self, theater):
+        """
+        Get changes to apply at start of a tick, smoothed parameters moving one step toward values asked for
+        :param theater: Theater object parameters belong to
+        :return: a list of (stage number, instrument number, parameter, value) tuples, stage and instrument being None
+                 for tempo
+        """
+
+        changes = []
+        for target, (value, smoothing) in list(self._pending.items()):
+            current = self._get_value(theater, target)
+            if smoothing and current != value:
+                step = self._smooth(target[2], current, value, smoothing)
+            else:
+                step = value
+            if step == value:
+                del self._pending[target]
+            if step != current:
+                changes.append(target + (step,))
+        self._changes += len(changes)
+        return changes
+
+    def get_stats(self):
+        """
+        Get statistics of bindings
+        :return: a dictionary giving number of controller events bound, of changes applied and of values not reached yet
+        """
+
+        return {
+            'events': self._events,
+            'changes': self._changes,
+            'pending': len(self._pending),
+        }
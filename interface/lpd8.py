@@ -1,3 +1,6 @@
+import threading
+from collections import deque
+from time import sleep
 from pygame import midi
 from pygame import event
 from pygame import USEREVENT
@@ -67,6 +70,9 @@ class LPD8_Ctrl_Knob_Array:
 class LPD8:
     """
     Class used to interract with MIDI devices
+    MIDI messages are read by a background thread as soon as they come, and turned into pygame events once per frame
+    Knob events are coalesced, only latest value of each knob being posted, so that sweeping knobs does not flood the
+    event queue
     """
 
     # Define MIDI message types coming from LPD8 (base number in,dependant from chosen program number)
@@ -75,6 +81,9 @@ class LPD8:
     _NOTE_OFF = 128
     _CTRL = 176
 
+    # Time in seconds reader thread waits for before checking again for messages
+    _POLL_INTERVAL = 0.001
+
     def __init__(self, program=3, bank=0, buffer_size=50):
         """
         Class constructor
@@ -82,7 +91,8 @@ class LPD8:
         It allows turning control knobs full speed without choking the reader
         :param program: numeric value from 0 to 3 corresponding to choice triggered by PROGRAM key on LPD8
         :param bank: numeric value from 0 to 7  corresponding to choice triggered by PROG/CHNG key on LPD8
-        :param buffer_size: MIDI buffer size for read operations
+        :param buffer_size: MIDI buffer size for read operations, that is maximum number of messages read at once by
+                            reader thread
         """
 
         # Store class properties
@@ -108,6 +118,33 @@ class LPD8:
             self._lpd8_in = None
             print('LPD8 input device not found...')
 
+        # MIDI messages read with their timestamps, waiting to be treated - appending and popping both ends of a deque
+        # are thread safe, so reader thread and main loop never wait for each other
+        self._messages = deque()
+
+        # Number of messages read, of events posted and of knob events left out as a later value of knob came
+        self._read = 0
+        self._posted = 0
+        self._coalesced = 0
+
+        # Start reader thread if LPD8 is connected
+        self._reading = self._lpd8_in is not None
+        self._reader = None
+        if self._reading:
+            self._reader = threading.Thread(target=self._read_messages, name='LPD8 reader', daemon=True)
+            self._reader.start()
+
+    def _read_messages(self):
+        # Reader thread loop - move MIDI messages from LPD8 to queue as soon as they come, with their timestamps
+
+        while self._reading:
+            if self._lpd8_in.poll():
+                midi_events = self._lpd8_in.read(self._buffer_size)
+                self._messages.extend(midi_events)
+                self._read += len(midi_events)
+            else:
+                sleep(self._POLL_INTERVAL)
+
     def _get_msg_type(self, raw_msg_type):
         # Identify message type from MIDI message number
         # MIDI number is always starting from a base number defining message type
@@ -130,65 +167,94 @@ class LPD8:
             msg_type = self._NOTE_OFF
         return msg_type
 
-    def _treat_midi_event(self, midi_event):
+    def _post(self, event_type, attributes):
+        # Post a pygame event that will be treated in application main loop
+
+        event.post(event.Event(event_type, attributes))
+        self._posted += 1
+
+    def _treat_midi_event(self, midi_event, knobs):
         # Treatment of MIDI message based on message type and associated values
         # Most of the time, it ends up firing a pygame event that will be treated in application main loop
+        # Knob values are kept in given dictionary by (program, bank, knob), events being posted once all messages read
+        # Every event gets timestamp of its MIDI message, in milliseconds of pygame.midi clock
 
         msg_type = self._get_msg_type(midi_event[0][0])
         msg_action = midi_event[0][1]
         msg_value = midi_event[0][2]
+        timestamp = midi_event[1]
         if msg_type == self._PGM_CHG:
             self._bank = msg_action
-            pygame_event = event.Event(LPD8_Events.LPD8_PGM_CHG, {'pgm': self._program,
-                                                                 'bank': msg_action})
-            event.post(pygame_event)
+            self._post(LPD8_Events.LPD8_PGM_CHG, {'pgm': self._program,
+                                                 'bank': msg_action,
+                                                 'time': timestamp})
         elif msg_type == self._NOTE_ON:
-            pygame_event = event.Event(LPD8_Events.LPD8_NOTE_ON, {'pgm': self._program,
-                                                                 'bank': self._bank,
-                                                                 'note': msg_action,
-                                                                 'velocity': msg_value})
-            event.post(pygame_event)
+            self._post(LPD8_Events.LPD8_NOTE_ON, {'pgm': self._program,
+                                                 'bank': self._bank,
+                                                 'note': msg_action,
+                                                 'velocity': msg_value,
+                                                 'time': timestamp})
         elif msg_type == self._NOTE_OFF:
-            pygame_event = event.Event(LPD8_Events.LPD8_NOTE_OFF, {'pgm': self._program,
-                                                                 'bank': self._bank,
-                                                                 'note': msg_action})
-            event.post(pygame_event)
+            self._post(LPD8_Events.LPD8_NOTE_OFF, {'pgm': self._program,
+                                                  'bank': self._bank,
+                                                  'note': msg_action,
+                                                  'time': timestamp})
         elif msg_type >= self._CTRL:
+
+            # Every knob step goes through knob array, so that knobs still pick up values smoothly
             msg_value = self._ctrl_knob_array.set_value(self._program, self._bank, msg_action, msg_value)
             if msg_value == -1:
                 pass
             else:
-                pygame_event = event.Event(LPD8_Events.LPD8_CTRL, {'pgm': self._program,
-                                                                   'bank': self._bank,
-                                                                   'ctrl': msg_action,
-                                                                   'value': msg_value})
-                event.post(pygame_event)
+                key = (self._program, self._bank, msg_action)
+                if key in knobs:
+                    self._coalesced += 1
+                knobs[key] = (msg_value, timestamp)
 
     def get_messages(self):
         """
-        Read MIDI messages from LPD8 if any and trigger a corresponding pygame event
+        Treat MIDI messages read from LPD8 since last call if any and trigger corresponding pygame events
+        Program changes and pads trigger an event each, in order they came, knobs only trigger an event for their latest
+        value, after all other events
         """
 
-        # Only perform reading if LPD8 is connected
-        if not self._lpd8_in == None:
+        # Treat message queue, as long as reader thread fills it
+        knobs = {}
+        while self._messages:
 
-            # Check there are awaiting messages
-            if self._lpd8_in.poll():
+            # Transform this MIDI event into a pygame event for treatment in main loop
+            self._treat_midi_event(self._messages.popleft(), knobs)
 
-                # Read awaiting messages
-                midi_events = self._lpd8_in.read(self._buffer_size)
+        # Post latest value of each knob moved
+        for (program, bank, ctrl), (value, timestamp) in knobs.items():
+            self._post(LPD8_Events.LPD8_CTRL, {'pgm': program,
+                                               'bank': bank,
+                                               'ctrl': ctrl,
+                                               'value': value,
+                                               'time': timestamp})
 
-                # Treat message queue
-                for midi_event in midi_events:
+    def get_stats(self):
+        """
+        Get statistics of MIDI input
+        :return: a dictionary giving number of MIDI messages read, of pygame events posted, of knob events left out as a
+                 later value of same knob came during same frame, and number of messages waiting to be treated
+        """
 
-                    # Transform this MIDI event into a pygame event for treatment in main loop
-                    self._treat_midi_event(midi_event)
+        return {
+            'read': self._read,
+            'posted': self._posted,
+            'coalesced': self._coalesced,
+            'waiting': len(self._messages),
+        }
 
     def close(self):
         """
         Close MIDI input stream
         """
 
-        # Only perform closing if LPD8 is connected
+        # Only perform closing if LPD8 is connected, once reader thread is over
         if not self._lpd8_in == None:
+            self._reading = False
+            self._reader.join()
             self._lpd8_in.close()
+            self._lpd8_in = None
@@ -0,0 +1,86 @@
+import struct
+
+class Midi_file:
+    """
+    Class used to write notes played during a performance to a Standard MIDI File
+    Each instrument gets its own track and channel, each tick lasts a quarter note at a tempo matching theater's tempo
+    """
+
+    # Number of MIDI time units in a quarter note, that is in a tick
+    _TICKS_PER_BEAT = 96
+
+    def __init__(self, tempo, velocity=100):
+        """
+        Class constructor
+        :param tempo: theater's tempo, in ticks per minute
+        :param velocity: velocity of all notes, from 1 to 127
+        """
+
+        # Store class properties
+        self._tempo = tempo
+        self._velocity = velocity
+
+        # Notes played by each instrument, as lists of (tick, notes) tuples, in order of first note
+        self._tracks = {}
+
+    def _var_length(self, value):
+        # Encode a number as a MIDI variable length quantity, seven bits per byte, most significant first
+
+        data = [value & 0x7F]
+        value >>= 7
+        while value:
+            data.insert(0, (value & 0x7F) | 0x80)
+            value >>= 7
+        return bytes(data)
+
+    def _track_chunk(self, events):
+        # Build a track chunk from a list of (time, data) events sorted by time
+
+        data = []
+        time = 0
+        for event_time, event_data in events:
+            data.append(self._var_length(event_time - time) + event_data)
+            time = event_time
+        data.append(self._var_length(0) + b'\xff\x2f\x00')
+        data = b''.join(data)
+        return b'MTrk' + struct.pack('>I', len(data)) + data
+
+    def add_notes(self, tick, name, notes):
+        """
+        Add notes played by an instrument during a tick
+        :param tick: tick number, from start of performance
+        :param name: name of instrument
+        :param notes: an array containing notes to play in midi note format
+        """
+
+        self._tracks.setdefault(name, []).append((tick, notes))
+
+    def save(self, path):
+        """
+        Write all notes to a type 1 Standard MIDI File
+        :param path: path of MIDI file
+        """
+
+        # First track only holds tempo, one tick lasting one quarter note
+        tempo = struct.pack('>I', round(60000000 / self._tempo))[1:]
+        chunks = [self._track_chunk([(0, b'\xff\x51\x03' + tempo)])]
+
+        # Then one track per instrument, named after it
+        for channel, (name, played) in enumerate(self._tracks.items()):
+            channel %= 16
+            label = name.encode()
+            events = []
+            for tick, notes in played:
+                for note in notes:
+                    note = min(max(note, 0), 127)
+
+                    # Notes last a whole tick, a note stopping at a time is sorted before one starting at same time
+                    events.append(((tick + 1) * self._TICKS_PER_BEAT, 0, bytes((0x80 | channel, note, 0))))
+                    events.append((tick * self._TICKS_PER_BEAT, 1, bytes((0x90 | channel, note, self._velocity))))
+            events.sort(key=lambda event: event[:2])
+            events = [(0, b'\xff\x03' + self._var_length(len(label)) + label)] + [(time, data) for time, _, data in events]
+            chunks.append(self._track_chunk(events))
+
+        header = b'MThd' + struct.pack('>IHHH', 6, 1, len(chunks), self._TICKS_PER_BEAT)
+        with open(path, 'wb') as midi_file:
+            midi_file.write(header + b''.join(chunks))
@@ -0,0 +1,48 @@
+class Nrt_score:
+    """
+    Class used to write notes played during a performance to a SuperCollider score for non real time rendering
+    Every note becomes a /s_new command of the synth defined in sc/boing.scd, rendered offline by sc/boing_nrt.scd
+    """
+
+    def __init__(self, tick_duration, synthdef='simple_osc', volumes=None, default_volume=0.1):
+        """
+        Class constructor
+        :param tick_duration: duration of a tick in seconds
+        :param synthdef: name of synth definition used to play notes
+        :param volumes: dictionary giving volume of each instrument by its name, as in sc/boing.scd if not given
+        :param default_volume: volume of instruments missing from volumes dictionary
+        """
+
+        # Store class properties
+        self._tick_duration = tick_duration
+        self._synthdef = synthdef
+        self._volumes = {'xylophone': 0.05, 'bass': 0.1} if volumes is None else volumes
+        self._default_volume = default_volume
+
+        # Score lines, already sorted by time as ticks come in order
+        self._lines = []
+
+    def add_notes(self, tick, name, notes):
+        """
+        Add notes played by an instrument during a tick
+        :param tick: tick number, from start of performance
+        :param name: name of instrument
+        :param notes: an array containing notes to play in midi note format
+        """
+
+        time = tick * self._tick_duration
+        volume = self._volumes.get(name, self._default_volume)
+        for note in notes:
+            # Node id -1 lets server choose it, synths are added to head of root group
+            self._lines.append('[%.6f, [\\s_new, \\%s, -1, 0, 0, \\midinote, %d, \\vol, %g]]'
+                               % (time, self._synthdef, note, volume))
+
+    def save(self, path):
+        """
+        Write score as timed OSC commands written in SuperCollider syntax, one per line, to be loaded by sc/boing_nrt.scd
+        :param path: path of score file
+        """
+
+        with open(path, 'w') as score_file:
+            for line in self._lines:
+                score_file.write(line + '\n')
@@ -1,19 +1,223 @@
-from pythonosc import udp_client
+import socket
+import struct
+from collections import OrderedDict, deque
+from threading import Condition, Thread
+from pythonosc.osc_message_builder import OscMessageBuilder
 
 class Osc_client():
     """
     Class used to creat an OSC client to send message to an external synthesiser listening to OSC messages
     """
 
-    def __init__(self, host='127.0.0.1', port=57120):
+    # Seconds between NTP epoch (1900) used by OSC timetags and Unix epoch (1970)
+    _NTP_DELTA = 2208988800
+
+    # Special OSC timetag asking to perform a bundle at once
+    _IMMEDIATELY = struct.pack('>II', 0, 1)
+
+    # What to do with a datagram sent while sending queue is full
+    _OVERFLOWS = ('drop_oldest', 'drop_newest', 'block')
+
+    # Synth definition and parameters of instruments missing from synths dictionary, as defined in sc/boing.scd
+    _DEFAULT_SYNTH = ('simple_osc', {'vol': 0.1})
+
+    # Node ids allocated to synths started straight on scsynth - lower ids are left to other clients
+    _FIRST_NODE = 1000
+    _LAST_NODE = 0x7fffffff
+
+    def __init__(self, host='127.0.0.1', port=57120, max_datagram=1472, cache_size=1024,
+                 queue_size=0, overflow='drop_oldest', synths=None):
         """
         Class constructor
         :param host: URL used to reach OSC listener
         :param port: port used to reach OSC listener
+        :param max_datagram: maximum size in bytes of a sent datagram, bigger bundles are split - default value fits
+                             in an Ethernet frame
+        :param cache_size: number of encoded messages kept to be sent again without encoding them, 0 to disable cache
+        :param queue_size: when not zero, datagrams are put in a queue of this size and sent by a background thread,
+                           so that sending never waits on network - when zero, datagrams are sent at once
+        :param overflow: what to do when queue is full - 'drop_oldest' drops oldest queued datagram, 'drop_newest'
+                         drops datagram being sent and 'block' waits for room in queue
+        :param synths: when given, listener is a SuperCollider server (scsynth) and every note starts a synth on it
+                       with a /s_new command, without going through sclang - dictionary giving a (synth definition
+                       name, parameters dictionary) tuple for each instrument by its name, a note being given to
+                       synth as its midinote parameter
         """
 
-        # Initiate OSC client
-        self._osc_client = udp_client.SimpleUDPClient(host, port)
+        if overflow not in self._OVERFLOWS:
+            raise ValueError('Unknown overflow policy: ' + str(overflow))
+
+        # Store class properties
+        self._max_datagram = max_datagram
+        self._cache_size = cache_size
+        self._queue_size = queue_size
+        self._overflow = overflow
+        self._synths = synths
+
+        # Id of next node started on scsynth, ids wrap around as synths free themselves once played
+        self._next_node = self._FIRST_NODE
+
+        # Least recently used cache of encoded messages, by URL and notes, with its statistics
+        # Stages often replay same chords, encoding them again each time would be a waste
+        self._cache = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+        # Resolve OSC listener address once and open an UDP socket to reach it
+        family, _, _, _, self._address = socket.getaddrinfo(host, port, type=socket.SOCK_DGRAM)[0]
+        self._socket = socket.socket(family, socket.SOCK_DGRAM)
+
+        # Queue of datagrams waiting to be sent by background thread, with its statistics
+        self._queue = deque()
+        self._condition = Condition()
+        self._closed = False
+        self._max_depth = 0
+        self._dropped = 0
+        self._sent = 0
+        self._errors = 0
+        self._sender = None
+        if queue_size > 0:
+            self._sender = Thread(target=self._drain, name='Osc_client sender', daemon=True)
+            self._sender.start()
+
+    def _encode_message(self, url, notes):
+        # Encode an OSC message holding notes to play, taking it from cache if it has already been encoded
+
+        key = (url, tuple(notes))
+        datagram = self._cache.get(key)
+        if datagram is not None:
+            self._cache.move_to_end(key)
+            self._hits += 1
+            return datagram
+        self._misses += 1
+        builder = OscMessageBuilder('/' + url)
+        for note in notes:
+            builder.add_arg(note)
+        datagram = builder.build().dgram
+        if self._cache_size > 0:
+            self._cache[key] = datagram
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return datagram
+
+    def _pad_length(self, text):
+        # Length of an OSC string, null terminated and padded to a multiple of 4 bytes
+
+        return len(text) + 4 - len(text) % 4
+
+    def _encode_synth(self, url, note):
+        # Encode a /s_new command starting a synth playing a note, with a node id to be replaced
+        # Returns encoded command, from cache if it has already been encoded, and position of its node id
+
+        key = (url, note)
+        template = self._cache.get(key)
+        if template is not None:
+            self._cache.move_to_end(key)
+            self._hits += 1
+            return template
+        self._misses += 1
+
+        # Synth is added to head of root group, which always exists, even without sclang
+        synthdef, parameters = self._synths.get(url, self._DEFAULT_SYNTH)
+        builder = OscMessageBuilder('/s_new')
+        for arg in [synthdef, 0, 0, 0, 'midinote', note]:
+            builder.add_arg(arg)
+        for name, value in parameters.items():
+            builder.add_arg(name)
+            builder.add_arg(value)
+        template = (builder.build().dgram,
+                    self._pad_length('/s_new') + self._pad_length(',' + 'x' * (6 + 2 * len(parameters)))
+                    + self._pad_length(synthdef))
+        if self._cache_size > 0:
+            self._cache[key] = template
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return template
+
+    def _allocate_node(self):
+        # Allocate a node id to a new synth
+
+        node = self._next_node
+        self._next_node = node + 1 if node < self._LAST_NODE else self._FIRST_NODE
+        return node
+
+    def _encode(self, url, notes):
+        # Encode notes to play as OSC messages - a single message for sclang, a /s_new command per note for scsynth
+
+        if self._synths is None:
+            return [self._encode_message(url, notes)]
+        datagrams = []
+        for note in notes:
+            datagram, position = self._encode_synth(url, note)
+            datagrams.append(datagram[:position] + struct.pack('>i', self._allocate_node()) + datagram[position + 4:])
+        return datagrams
+
+    def _encode_timetag(self, timetag):
+        # Convert a Unix time in nanoseconds to a 64 bits NTP timetag, None meaning at once
+
+        if timetag is None:
+            return self._IMMEDIATELY
+        seconds, nanoseconds = divmod(timetag, 1000000000)
+        return struct.pack('>II', seconds + self._NTP_DELTA, (nanoseconds << 32) // 1000000000)
+
+    def _encode_bundles(self, datagrams, timetag):
+        # Encode OSC bundles holding already encoded messages, to be performed at given time
+        # Messages are split in as many bundles as needed for each of them to fit in maximum datagram size
+
+        header = b'#bundle\0' + self._encode_timetag(timetag)
+        bundles = []
+        bundle = [header]
+        size = len(header)
+        for datagram in datagrams:
+            if len(bundle) > 1 and size + 4 + len(datagram) > self._max_datagram:
+                bundles.append(b''.join(bundle))
+                bundle = [header]
+                size = len(header)
+            bundle.append(struct.pack('>i', len(datagram)))
+            bundle.append(datagram)
+            size += 4 + len(datagram)
+        bundles.append(b''.join(bundle))
+        return bundles
+
+    def _transmit(self, datagram):
+        # Send a datagram at once, or queue it for background thread, following overflow policy when queue is full
+
+        if self._sender is None:
+            self._socket.sendto(datagram, self._address)
+            self._sent += 1
+            return
+        with self._condition:
+            if len(self._queue) >= self._queue_size:
+                if self._overflow == 'drop_newest':
+                    self._dropped += 1
+                    return
+                if self._overflow == 'drop_oldest':
+                    self._queue.popleft()
+                    self._dropped += 1
+                else:
+                    while len(self._queue) >= self._queue_size and not self._closed:
+                        self._condition.wait()
+            self._queue.append(datagram)
+            self._max_depth = max(self._max_depth, len(self._queue))
+            self._condition.notify_all()
+
+    def _drain(self):
+        # Background thread sending queued datagrams until client is closed and queue is empty
+        # A datagram that cannot be sent is counted as an error, a synthesiser going away must not stop this thread
+
+        while True:
+            with self._condition:
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                datagram = self._queue.popleft()
+                self._condition.notify_all()
+            try:
+                self._socket.sendto(datagram, self._address)
+                self._sent += 1
+            except OSError:
+                self._errors += 1
 
     def send(self, url, notes):
         """
@@ -22,4 +226,67 @@ class Osc_client():
         :param notes: an array containing notes to play in midi note format
         """
         if url != '':
-            self._osc_client.send_message('/' + url, notes)
+            for datagram in self._encode(url, notes):
+                self._transmit(datagram)
+
+    def send_bundle(self, messages, timetag=None):
+        """
+        Send OSC messages in a single bundle, stamped with the time they have to be played at
+        A synthesiser scheduling bundles plays them at this exact time, whatever network or Python latency is
+        Bundle is only split if it does not fit in maximum datagram size
+        :param messages: a list of (url, notes) tuples, as given to send method
+        :param timetag: time when messages have to be played, as a Unix time in nanoseconds (time.time_ns) - at once
+                        if not given
+        """
+
+        datagrams = [datagram for url, notes in messages if url != '' for datagram in self._encode(url, notes)]
+        if datagrams:
+            for bundle in self._encode_bundles(datagrams, timetag):
+                self._transmit(bundle)
+
+    def get_address(self):
+        """
+        Get address of OSC listener, clients sharing a same address reach a same listener
+        :return: address as given by socket.getaddrinfo
+        """
+
+        return self._address
+
+    def is_scsynth(self):
+        """
+        Tell if listener is a SuperCollider server, every note starting a synth on it
+        :return: True if notes are sent as /s_new commands
+        """
+
+        return self._synths is not None
+
+    def get_cache_stats(self):
+        """
+        Get statistics of encoded messages cache
+        :return: a dictionary giving number of cached messages, hits and misses
+        """
+
+        return {'size': len(self._cache), 'hits': self._hits, 'misses': self._misses}
+
+    def get_transport_stats(self):
+        """
+        Get statistics of datagrams sending
+        :return: a dictionary giving current and maximum depth of sending queue, number of datagrams sent, dropped
+                 because queue was full and that could not be sent
+        """
+
+        return {'depth': len(self._queue), 'max_depth': self._max_depth, 'sent': self._sent, 'dropped': self._dropped,
+                'errors': self._errors}
+
+    def close(self):
+        """
+        Send datagrams still waiting in queue and stop background thread, if any
+        Datagrams sent after closing are sent at once
+        """
+
+        if self._sender is not None:
+            with self._condition:
+                self._closed = True
+                self._condition.notify_all()
+            self._sender.join()
+            self._sender = None
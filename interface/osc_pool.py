@@ -0,0 +1,68 @@
+import socket
+from .osc_client import Osc_client
+
+class Osc_pool:
+    """
+    Class used to share OSC clients across a whole process, one client and so one socket per OSC listener
+    Stages and instruments sending notes to a same listener share its client, whatever URL they reach it with
+    """
+
+    # Clients by (URL, port) as asked for and by resolved listener address
+    _clients = {}
+    _addresses = {}
+
+    @classmethod
+    def get_client(cls, host, port, queue_size=0, overflow='drop_oldest', synths=None):
+        """
+        Get client reaching an OSC listener, created on first request
+        Options are only used when client is created, first stage asking for a listener sets how it is reached
+        :param host: URL used to reach OSC listener
+        :param port: port used to reach OSC listener
+        :param queue_size: size of sending queue of client, 0 to send datagrams at once - see Osc_client
+        :param overflow: what to do when sending queue is full - see Osc_client
+        :param synths: synth definition and parameters of each instrument when listener is scsynth - see Osc_client
+        :return: an Osc_client object
+        """
+
+        client = cls._clients.get((host, port))
+        if client is None:
+            address = socket.getaddrinfo(host, port, type=socket.SOCK_DGRAM)[0][4]
+            client = cls._addresses.get(address)
+            if client is None:
+                client = Osc_client(host, port, queue_size=queue_size, overflow=overflow, synths=synths)
+                cls._addresses[address] = client
+            cls._clients[(host, port)] = client
+        return client
+
+    @classmethod
+    def get_clients(cls):
+        """
+        Get all clients of pool, one per OSC listener
+        :return: a list of Osc_client objects
+        """
+
+        return list(cls._addresses.values())
+
+    @classmethod
+    def send(cls, messages, timetag=None):
+        """
+        Send OSC messages to their listeners, in a single bundle per listener
+        :param messages: a list of (client, url, notes) tuples
+        :param timetag: time when messages have to be played, as a Unix time in nanoseconds - at once if not given
+        """
+
+        bundles = {}
+        for client, url, notes in messages:
+            bundles.setdefault(client, []).append((url, notes))
+        for client, client_messages in bundles.items():
+            client.send_bundle(client_messages, timetag)
+
+    @classmethod
+    def close(cls):
+        """
+        Send datagrams still waiting to be sent by all clients and stop their background threads
+        Clients stay in pool and send datagrams at once from now on
+        """
+
+        for client in cls._addresses.values():
+            client.close()
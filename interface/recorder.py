@@ -0,0 +1,556 @@
+import bisect
+import json
+import mmap
+import os
+import struct
+import zlib
+import numpy as np
+
+# A log starts with magic bytes and a JSON header telling tempo, whether frames are recorded, and size, instrument names
+# and colors of each stage, then holds blocks of ticks, each one compressed on its own and preceded by its length
+# All numbers are written as variable length integers, seven bits per byte, least significant first
+# A block starts with number of its first tick, then holds records one after the other:
+# - control: a controller event, as event number, program, bank, note or knob number and value
+# - tempo: a tempo change heard from next tick on, as a little endian 64 bits float - a block whose first tick is not at
+#   tempo of header starts with tempo of its first tick, so that reading may start at any block
+# - tick: number of ticks since previous tick, then for each stage cells born, notes played and frame drawn
+# Frames are numbered from start of each block, so that reading may start at any block
+# Controller events heard after last tick recorded are written at end of last block, or in a block of their own holding
+# no tick, and are heard before first tick of next block when log is extended - blocks without tick are not indexed
+# Index sidecar file, named after log with .idx appended, holds first tick number and byte offset of each block, as
+# pairs of little endian 64 bits integers
+
+_MAGIC = b'BOING-LOG\x01'
+_CONTROL = 0
+_TICK = 1
+_TEMPO = 2
+
+# Frame references - no frame, a new frame follows, or number of a frame already written in block plus this offset
+_NO_FRAME = 0
+_NEW_FRAME = 1
+_FRAME_OFFSET = 2
+
+_INDEX_ENTRY = struct.Struct('<QQ')
+_TEMPO_VALUE = struct.Struct('<d')
+
+def _write_varint(data, value):
+    # Append a non negative number to a bytearray as a variable length integer
+
+    while value > 0x7F:
+        data.append((value & 0x7F) | 0x80)
+        value >>= 7
+    data.append(value)
+
+def _read_varint(data, offset):
+    # Read a variable length integer at an offset of data, raises IndexError if data ends before
+    # Returns number read and offset after it
+
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+class Recorder:
+    """
+    Class used to record a performance in a compact binary log, to replay it later without computing it again
+    Each tick takes a few bytes - cells born, notes played and a reference to the frame drawn, each frame being written
+    once per block of ticks and referenced afterwards, which suits stages coming back to same states over and over
+    Blocks are compressed and appended to log as they are complete, a log being extended when recorded again
+    """
+
+    def __init__(self, path, stages, tempo, frames=True, index_interval=1000):
+        """
+        Class constructor - starts a new log, or appends to an existing log of same stages
+        :param path: path of log file, its index is written next to it with .idx appended
+        :param stages: a list of Stage objects recorded, with all their instruments
+        :param tempo: theater's tempo, in ticks per minute
+        :param frames: if True, states of cells are recorded with each tick so that replays are drawn too
+        :param index_interval: maximum number of ticks in a block - ticks are written to disk a block at a time, and
+                               replays may start at any block
+        """
+
+        # Store class properties
+        self._path = path
+        self._frames = frames
+        self._index_interval = index_interval
+        self._sizes = [stage.get_size() for stage in stages]
+        header = {
+            'tempo': tempo,
+            'frames': frames,
+            'stages': [{'size': stage.get_size(),
+                        'instruments': [{'name': instrument.get_name(),
+                                         'color': list(instrument.get_color(False, False))}
+                                        for instrument in stage.get_instruments()]}
+                       for stage in stages],
+        }
+
+        # Unfinished last block of an existing log is cut off, ticks going on after its last tick at its last tempo
+        self._last_tick = None
+        self._header_tempo = tempo
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            recording = Recording(path)
+            if recording.get_header() != header:
+                recording.close()
+                raise ValueError('Log %s records another performance' % path)
+            end, last_tick = recording.get_end()
+            tempo = recording.get_tempo()
+            index = [(tick, offset) for tick, offset in recording.get_index() if offset < end]
+            recording.close()
+            with open(path, 'r+b') as log:
+                log.truncate(end)
+            with open(path + '.idx', 'wb') as index_file:
+                index_file.write(b''.join(_INDEX_ENTRY.pack(tick, offset) for tick, offset in index))
+            self._last_tick = last_tick
+            self._log = open(path, 'ab')
+            self._end = end
+        else:
+            data = bytearray(_MAGIC)
+            encoded = json.dumps(header).encode()
+            _write_varint(data, len(encoded))
+            data += encoded
+            self._log = open(path, 'wb')
+            self._log.write(data)
+            self._end = len(data)
+            open(path + '.idx', 'wb').close()
+        self._index = open(path + '.idx', 'ab')
+
+        # Records of current block, None when no block is started, and controller events and tempo changes waiting for
+        # their tick - tempo is the one asked for last, and the one of last tick recorded
+        self._data = None
+        self._controls = bytearray()
+        self._tempo = tempo
+        self._tick_tempo = tempo
+
+        # First tick of current block, number of ticks recorded in it, and frames written in it by their encoding
+        self._block_tick = None
+        self._block_ticks = 0
+        self._frame_numbers = {}
+
+        # Number of ticks recorded, of frames written and of frames referenced
+        self._ticks = 0
+        self._new_frames = 0
+        self._references = 0
+
+    def _encode_frame(self, size, snapshot):
+        # Encode a snapshot as number of cells, then position and flags of each cell
+        # Cells are written as two bytes each when positions and flags are small enough, which is the usual case
+
+        line, col, flash, collide, instrument = snapshot
+        positions = line.astype(np.int64) * size + col
+        flags = instrument.astype(np.int64) * 4 + collide.astype(np.int64) * 2 + flash
+        data = bytearray()
+        _write_varint(data, len(positions))
+        if len(positions) and max(positions.max(), flags.max()) < 0x80:
+            data += np.column_stack((positions, flags)).astype(np.uint8).tobytes()
+        else:
+            for position, flag in zip(positions.tolist(), flags.tolist()):
+                _write_varint(data, position)
+                _write_varint(data, flag)
+        return bytes(data)
+
+    def _write_block(self):
+        # Compress current block and write it to disk, then its index entry if it holds ticks
+
+        if self._data is None:
+            return
+        compressed = zlib.compress(self._data)
+        block = bytearray()
+        _write_varint(block, len(compressed))
+        block += compressed
+        self._log.write(block)
+        self._log.flush()
+        if self._block_ticks:
+            self._index.write(_INDEX_ENTRY.pack(self._block_tick, self._end))
+            self._index.flush()
+        self._end += len(block)
+        self._data = None
+        self._block_ticks = 0
+
+    def has_frames(self):
+        """
+        Tell if states of cells are recorded with each tick
+        :return: True if frames are recorded
+        """
+
+        return self._frames
+
+    def add_control(self, event, program, bank, number=0, value=0):
+        """
+        Record a controller event, heard before next tick recorded
+        :param event: event number, like offset of a LPD8_Events event type from LPD8_PGM_CHG
+        :param program: program of controller
+        :param bank: bank of controller
+        :param number: note or knob number
+        :param value: velocity or knob value
+        """
+
+        self._controls.append(_CONTROL)
+        for field in (event, program, bank, number, value):
+            _write_varint(self._controls, field)
+
+    def add_tempo(self, tempo):
+        """
+        Record a tempo change, heard from next tick recorded on
+        :param tempo: tempo in ticks per minute
+        """
+
+        if tempo != self._tempo:
+            self._tempo = tempo
+            self._controls.append(_TEMPO)
+            self._controls += _TEMPO_VALUE.pack(tempo)
+
+    def add_tick(self, tick, stages):
+        """
+        Record a tick
+        :param tick: tick number, greater than previous one - when extending a log, performance has to go on from
+                     tick given by get_next_tick
+        :param stages: for each stage, a (births, notes, snapshot) tuple - births being numbers of instruments a cell has
+                       been born in, notes a list of (instrument number, notes) tuples and snapshot a snapshot as given
+                       by Stage.get_snapshot, or None
+        """
+
+        if self._last_tick is not None and tick <= self._last_tick:
+            raise ValueError('Tick %d recorded after tick %d' % (tick, self._last_tick))
+
+        # Start a block with its first tick, frames being numbered again from here on
+        if self._block_ticks >= self._index_interval:
+            self._write_block()
+        if self._data is None:
+            self._data = bytearray()
+            _write_varint(self._data, tick)
+            self._block_tick = tick
+            self._last_tick = tick
+            self._frame_numbers = {}
+            if self._tick_tempo != self._header_tempo:
+                self._data.append(_TEMPO)
+                self._data += _TEMPO_VALUE.pack(self._tick_tempo)
+
+        # Controller events and tempo changes heard since previous tick come first
+        data = self._data
+        data += self._controls
+        self._controls = bytearray()
+        self._tick_tempo = self._tempo
+
+        data.append(_TICK)
+        _write_varint(data, tick - self._last_tick)
+        for size, (births, notes, snapshot) in zip(self._sizes, stages):
+            _write_varint(data, len(births))
+            for instrument in births:
+                _write_varint(data, instrument)
+            _write_varint(data, len(notes))
+            for instrument, instrument_notes in notes:
+                _write_varint(data, instrument)
+                _write_varint(data, len(instrument_notes))
+                for note in instrument_notes:
+                    _write_varint(data, note)
+
+            # Frames already written in block are only referenced
+            if self._frames:
+                if snapshot is None:
+                    data.append(_NO_FRAME)
+                else:
+                    frame = self._encode_frame(size, snapshot)
+                    number = self._frame_numbers.get(frame)
+                    if number is None:
+                        self._frame_numbers[frame] = len(self._frame_numbers)
+                        data.append(_NEW_FRAME)
+                        data += frame
+                        self._new_frames += 1
+                    else:
+                        _write_varint(data, number + _FRAME_OFFSET)
+                        self._references += 1
+        self._last_tick = tick
+        self._block_ticks += 1
+        self._ticks += 1
+
+    def flush(self):
+        """
+        Compress current block and write it to disk, then its index entry - next tick starts a new block
+        Controller events heard since last tick are written at end of block, a block being started for them if needed
+        """
+
+        if self._controls:
+            if self._data is None:
+                self._data = bytearray()
+                _write_varint(self._data, 0 if self._last_tick is None else self._last_tick)
+            self._data += self._controls
+            self._controls = bytearray()
+        self._write_block()
+
+    def close(self):
+        """
+        Write block still waiting and close log
+        """
+
+        self.flush()
+        self._log.close()
+        self._index.close()
+
+    def get_next_tick(self):
+        """
+        Get number of tick performance has to go on from, after last tick of log when extending one
+        :return: a tick number, 0 for a new log
+        """
+
+        return 0 if self._last_tick is None else self._last_tick + 1
+
+    def get_stats(self):
+        """
+        Get statistics of recording
+        :return: a dictionary giving number of ticks recorded, of frames written and referenced, and size of log on disk
+                 in bytes
+        """
+
+        return {
+            'ticks': self._ticks,
+            'frames': self._new_frames,
+            'references': self._references,
+            'bytes': self._end,
+        }
+
+class Recording:
+    """
+    Class used to read a log written by a Recorder, tick after tick, from its start or from any tick
+    Log is mapped in memory and read a block at a time, frames being decoded once per block, so reading a tick costs
+    next to nothing
+    """
+
+    def __init__(self, path):
+        """
+        Class constructor - reads header and index of log
+        :param path: path of log file
+        """
+
+        with open(path, 'rb') as log:
+            self._log = mmap.mmap(log.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._log[:len(_MAGIC)] != _MAGIC:
+            self._log.close()
+            raise ValueError('%s is not a BoInG! log' % path)
+        length, offset = _read_varint(self._log, len(_MAGIC))
+        self._header = json.loads(self._log[offset:offset + length].decode())
+        self._start = offset + length
+        self._sizes = [stage['size'] for stage in self._header['stages']]
+        self._types = [(np.min_scalar_type(stage['size']), np.min_scalar_type(len(stage['instruments'])))
+                       for stage in self._header['stages']]
+
+        # Index entries only point inside log, a last entry may have been cut off
+        self._index_ticks = []
+        self._index_offsets = []
+        if os.path.exists(path + '.idx'):
+            with open(path + '.idx', 'rb') as index_file:
+                index = index_file.read()
+            for tick, offset in _INDEX_ENTRY.iter_unpack(index[:len(index) - len(index) % _INDEX_ENTRY.size]):
+                if offset < len(self._log):
+                    self._index_ticks.append(tick)
+                    self._index_offsets.append(offset)
+
+        # Offset of next block in log, current block and offset in it, frames decoded in it, last tick read and its
+        # tempo
+        self._offset = self._start
+        self._block = b''
+        self._position = 0
+        self._frames = []
+        self._last_tick = -1
+        self._tempo = self._header['tempo']
+
+        # Tick read ahead by seek
+        self._pending = None
+
+    def _next_block(self):
+        # Read and decompress next block of log, raises IndexError if log ends before it is complete
+
+        length, offset = _read_varint(self._log, self._offset)
+        if offset + length > len(self._log):
+            raise IndexError('Log ends inside a block')
+        try:
+            block = zlib.decompress(self._log[offset:offset + length])
+        except zlib.error:
+            raise IndexError('Log ends inside a block')
+        tick, self._position = _read_varint(block, 0)
+        self._block = block
+        self._offset = offset + length
+        self._frames = []
+        self._last_tick = tick
+
+    def _go_to(self, offset):
+        # Read log from a block on
+
+        self._offset = offset
+        self._block = b''
+        self._position = 0
+        self._pending = None
+        self._tempo = self._header['tempo']
+
+    def _read_frame(self, stage):
+        # Read a frame in current block and decode it as a snapshot
+        # Cells written as two bytes each are decoded at once, single byte numbers being stored as is
+
+        block = self._block
+        cells, self._position = _read_varint(block, self._position)
+        values = np.frombuffer(block, dtype=np.uint8, count=2 * cells, offset=self._position).astype(np.int64)
+        if (values < 0x80).all():
+            self._position += 2 * cells
+        else:
+            values = []
+            for value in range(2 * cells):
+                value, self._position = _read_varint(block, self._position)
+                values.append(value)
+            values = np.array(values, dtype=np.int64)
+        positions = values[0::2]
+        flags = values[1::2]
+        position_type, instrument_type = self._types[stage]
+        size = self._sizes[stage]
+        return ((positions // size).astype(position_type), (positions % size).astype(position_type),
+                (flags & 1).astype(bool), (flags & 2).astype(bool), (flags >> 2).astype(instrument_type))
+
+    def _read_tick(self):
+        # Read records up to next tick, raises IndexError at end of log
+        # Controller events and tempo changes at end of a block are heard before first tick of next one
+
+        controls = []
+        while True:
+            if self._position >= len(self._block):
+                self._next_block()
+            block = self._block
+            if block[self._position] == _TEMPO:
+                self._tempo = _TEMPO_VALUE.unpack_from(block, self._position + 1)[0]
+                self._position += 1 + _TEMPO_VALUE.size
+                continue
+            if block[self._position] != _CONTROL:
+                break
+            control = []
+            self._position += 1
+            for field in range(5):
+                value, self._position = _read_varint(block, self._position)
+                control.append(value)
+            controls.append(tuple(control))
+        self._position += 1
+
+        # Read a varint and move on
+        def read():
+            value, self._position = _read_varint(block, self._position)
+            return value
+
+        tick = self._last_tick + read()
+        stages = []
+        for stage in range(len(self._sizes)):
+            births = [read() for birth in range(read())]
+            notes = []
+            for played in range(read()):
+                instrument = read()
+                notes.append((instrument, [read() for note in range(read())]))
+            frame = None
+            if self._header['frames']:
+                reference = read()
+                if reference == _NEW_FRAME:
+                    frame = self._read_frame(stage)
+                    self._frames.append(frame)
+                elif reference >= _FRAME_OFFSET:
+                    frame = self._frames[reference - _FRAME_OFFSET]
+            stages.append((births, notes, frame))
+        self._last_tick = tick
+        return tick, controls, stages
+
+    def get_header(self):
+        """
+        Get header of log
+        :return: a dictionary giving tempo, whether frames are recorded, and size and instruments of each stage
+        """
+
+        return self._header
+
+    def get_tempo(self):
+        """
+        Get tempo of last tick read, or of tick sought
+        :return: tempo in ticks per minute
+        """
+
+        return self._tempo
+
+    def get_index(self):
+        """
+        Get index of log
+        :return: a list of (first tick number, byte offset) tuples, one per block
+        """
+
+        return list(zip(self._index_ticks, self._index_offsets))
+
+    def prepare_stage(self, number, stage):
+        """
+        Check a stage matches a stage of log and give its instruments their recorded colors
+        :param number: number of stage in log
+        :param stage: a Stage object, built like the recorded one
+        """
+
+        stages = self._header['stages']
+        if number >= len(stages):
+            raise ValueError('Log only records %d stages' % len(stages))
+        instruments = stage.get_instruments()
+        if (stage.get_size() != stages[number]['size']
+                or [instrument.get_name() for instrument in instruments]
+                != [instrument['name'] for instrument in stages[number]['instruments']]):
+            raise ValueError('Stage %d does not match recorded stage' % number)
+        for instrument, recorded in zip(instruments, stages[number]['instruments']):
+            instrument.set_color(tuple(recorded['color']))
+
+    def next_tick(self):
+        """
+        Read next tick of log
+        :return: a (tick number, controls, stages) tuple, None at end of log - controls being a list of (event, program,
+                 bank, number, value) tuples heard before tick and stages a list holding for each stage a (births, notes,
+                 snapshot) tuple, as given to Recorder.add_tick
+        """
+
+        if self._pending is not None:
+            record = self._pending
+            self._pending = None
+            return record
+        try:
+            return self._read_tick()
+        except IndexError:
+            return None
+
+    def seek(self, tick):
+        """
+        Go to a tick, next tick read being the first one from this tick on
+        Reading starts again from block holding tick, controller events heard before it are skipped
+        :param tick: tick number
+        """
+
+        block = bisect.bisect_right(self._index_ticks, tick) - 1
+        self._go_to(self._index_offsets[block] if block >= 0 else self._start)
+        record = self.next_tick()
+        while record is not None and record[0] < tick:
+            record = self.next_tick()
+        self._pending = record
+
+    def get_end(self):
+        """
+        Find end of last complete block of log, anything after it being unfinished
+        :return: an (offset, tick number) tuple - offset in bytes after last block and number of its last tick, None if
+                 log holds no tick
+        """
+
+        # Blocks are read from last indexed one on, going back a block as long as none is complete
+        for block in range(len(self._index_offsets) - 1, -2, -1):
+            self._go_to(self._index_offsets[block] if block >= 0 else self._start)
+            last_tick = None
+            record = self.next_tick()
+            while record is not None:
+                last_tick = record[0]
+                record = self.next_tick()
+            if last_tick is not None:
+                break
+        return self._offset, last_tick
+
+    def close(self):
+        """
+        Release log
+        """
+
+        self._log.close()
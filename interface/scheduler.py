@@ -0,0 +1,167 @@
+from time import perf_counter_ns, sleep, time_ns
+
+class Scheduler:
+    """
+    Class used to fire ticks at a steady tempo, without drift
+    Deadline of every tick is computed from an absolute start time, so a late tick never shifts following ones
+    Ticks missed after an overrun are all fired back to back, in order, so that a performance stays the same
+    With a lookahead, ticks are fired ahead of their deadline, so that their notes may be stamped with it
+    """
+
+    # Time before a deadline when sleeping stops and waiting goes on by actively checking time, in nanoseconds
+    _SPIN_NS = 1500000
+
+    def __init__(self, tempo, max_lateness=1.0, lookahead=0.0):
+        """
+        Class constructor
+        :param tempo: number of ticks per minute
+        :param max_lateness: in seconds - when ticks are later than this, schedule restarts from current time instead
+                             of firing all missed ticks at once, after the computer has been suspended for instance
+        :param lookahead: in seconds - how long before its deadline a tick is fired
+        """
+
+        # Store class properties
+        self._period = round(60000000000 / tempo)
+        self._max_lateness = round(max_lateness * 1000000000)
+        self._lookahead = round(lookahead * 1000000000)
+
+        # Start time of schedule and number of next tick to fire
+        # Difference between Unix time and perf_counter_ns time is taken once at start to give wall clock time of
+        # deadlines, so that it follows start time whenever schedule is moved
+        self._start = None
+        self._wall_offset = None
+        self._tick = 0
+
+        # Timing statistics
+        self._overruns = 0
+        self._total_lateness = 0
+        self._max_lateness_seen = 0
+        self._last_lateness = 0
+        self._restarts = 0
+
+    def start(self):
+        """
+        Start schedule, first tick having to be fired at once
+        """
+
+        self._wall_offset = time_ns() - perf_counter_ns()
+        self._start = perf_counter_ns() + self._lookahead
+        self._tick = 0
+
+    def get_deadline(self, tick=None):
+        """
+        Get time when a tick is due
+        :param tick: tick number, next tick to fire if not given
+        :return: deadline as a perf_counter_ns time
+        """
+
+        if tick is None:
+            tick = self._tick
+        return self._start + tick * self._period
+
+    def get_wall_time(self, tick):
+        """
+        Get wall clock time when a tick is due
+        :param tick: tick number
+        :return: deadline as a Unix time in nanoseconds
+        """
+
+        return self.get_deadline(tick) + self._wall_offset
+
+    def get_period(self):
+        """
+        Get time between two ticks
+        :return: period in nanoseconds
+        """
+
+        return self._period
+
+    def set_tempo(self, tempo):
+        """
+        Change tempo, next tick staying due at the same time
+        :param tempo: number of ticks per minute
+        """
+
+        if self._start is None:
+            self._period = round(60000000000 / tempo)
+            return
+        # Start time is moved so that next deadline stays the same, wall clock deadlines following it
+        deadline = self.get_deadline()
+        self._period = round(60000000000 / tempo)
+        self._start = deadline - self._tick * self._period
+
+    def get_fire_time(self):
+        """
+        Get time when next tick has to be fired, lookahead included
+        :return: time as a perf_counter_ns time
+        """
+
+        return self.get_deadline() - self._lookahead
+
+    def time_left(self):
+        """
+        Get time left before next tick has to be fired, lookahead included
+        :return: time left in nanoseconds, negative if next tick is already late
+        """
+
+        return self.get_fire_time() - perf_counter_ns()
+
+    def poll(self):
+        """
+        Tell if a tick has to be fired, lookahead included, and count it as fired
+        Call it again as long as it returns a tick number, to catch up with missed ticks
+        :return: number of tick to fire, None if no tick has to be fired yet
+        """
+
+        now = perf_counter_ns()
+        lateness = now - self.get_deadline() + self._lookahead
+        if lateness < 0:
+            return None
+
+        # Restart schedule from now if ticks are far too late
+        if lateness > self._max_lateness:
+            self._start = now + self._lookahead - self._tick * self._period
+            self._restarts += 1
+            lateness = 0
+
+        # Keep timing statistics
+        self._last_lateness = lateness
+        self._total_lateness += lateness
+        self._max_lateness_seen = max(self._max_lateness_seen, lateness)
+        if lateness >= self._period:
+            self._overruns += 1
+
+        tick = self._tick
+        self._tick += 1
+        return tick
+
+    def wait(self, deadline=None):
+        """
+        Wait precisely until a deadline, sleeping most of the time and actively checking time just before deadline
+        :param deadline: perf_counter_ns time to wait for, time when next tick has to be fired if not given
+        """
+
+        if deadline is None:
+            deadline = self.get_fire_time()
+        left = deadline - perf_counter_ns()
+        if left > self._SPIN_NS:
+            sleep((left - self._SPIN_NS) / 1000000000)
+        while perf_counter_ns() < deadline:
+            sleep(0)
+
+    def get_stats(self):
+        """
+        Get timing statistics since start
+        Lateness is the time between the moment a tick had to be fired and the moment it has really been fired
+        An overrun is a tick fired so late that next one was already due
+        :return: a dictionary of statistics, times in milliseconds
+        """
+
+        return {
+            'ticks': self._tick,
+            'overruns': self._overruns,
+            'last_lateness_ms': self._last_lateness / 1000000,
+            'mean_lateness_ms': self._total_lateness / max(self._tick, 1) / 1000000,
+            'max_lateness_ms': self._max_lateness_seen / 1000000,
+            'restarts': self._restarts,
+        }
@@ -1,6 +1,10 @@
+import numpy as np
 import pygame
-from random import seed as set_seed
-from .osc_client import Osc_client
+from collections import deque
+from random import Random
+from time import time_ns
+from .osc_pool import Osc_pool
+from helpers.vector_engine import Vector_engine
 
 class Stage:
     """
@@ -8,10 +12,29 @@ class Stage:
     A stage to
     """
 
+    # Maximum size in bytes of states recorded between two births to find a cycle, and estimated size of a cell state
+    # when instruments move their own cells
+    _CYCLE_BYTES = 32 * 1024 * 1024
+    _CELL_STATE_BYTES = 100
+
+    # Maximum number of states of cells waiting to be drawn, enough for ticks computed well ahead of time
+    _MAX_SNAPSHOTS = 256
+
+    # Parameters of instruments that may be changed while playing, by name, as (owner, getter, setter) tuples - owner
+    # being instrument itself or its scale
+    _PARAMETERS = {
+        'birth_rate': ('instrument', 'get_birth_rate', 'set_birth_rate'),
+        'max_cells': ('instrument', 'get_max_cells', 'set_max_cells'),
+        'scale': ('scale', 'get_name', 'set_name'),
+        'base': ('scale', 'get_base', 'set_base'),
+    }
+
     def __init__(self, x, y, width, size,
                  osc_url, osc_port,
                  seed=None,
-                 border_color=(255, 255, 255), background_color=(0, 0, 0), padding=10):
+                 border_color=(255, 255, 255), background_color=(0, 0, 0), padding=10,
+                 *, osc_queue=0, osc_overflow='drop_oldest', osc_mirrors=None, osc_synths=None, engine=None,
+                 renderer=None, memoize=False):
         """
         Class constructor
         :param x: x position in pixels of the upper left corner on theater window
@@ -24,6 +47,21 @@ class Stage:
         :param border_color: border color of stage as a RGB triplet
         :param background_color: background color of stage as a RGB triplet
         :param padding: padding in pixels between cells
+        :param osc_queue: when not zero, notes are queued and sent by a background thread, never waiting on network -
+                          size of this queue in datagrams
+        :param osc_overflow: what to do when OSC queue is full - 'drop_oldest', 'drop_newest' or 'block'
+        :param osc_mirrors: a list of (URL, port) tuples of other OSC listeners all notes are also sent to, like a
+                            recorder
+        :param osc_synths: when given, OSC listeners are SuperCollider servers notes are sent to straight, without
+                           sclang - dictionary giving a (synth definition name, parameters dictionary) tuple for each
+                           instrument by its name
+        :param engine: how cells are moved - None lets each instrument move its own cells, 'vector' moves all cells of
+                       all instruments at once in NumPy arrays, which is much faster for big stages and populations
+        :param renderer: how stage is drawn - None draws each cell as a rectangle, 'array' writes cells in a pixel
+                         array, one pixel per cell, and scales it to stage in one operation, for very big stages
+        :param memoize: if True, states of stage are recorded between births, and once stage comes back to a state it
+                        has already been in, ticks are replayed from records instead of being computed until next birth -
+                        only pays off when long cycles come back between births, recording states slows down others
         """
         
         # Store class properties
@@ -33,6 +71,9 @@ class Stage:
         self._size = size
         self._osc_url = osc_url
         self._osc_port = osc_port
+        self._osc_queue = osc_queue
+        self._osc_overflow = osc_overflow
+        self._osc_synths = osc_synths
         self._seed = seed
         self._border_color = border_color
         self._background_color = background_color
@@ -41,86 +82,617 @@ class Stage:
         # Store different instruments added to this stage
         self._instruments = []
 
+        # Window where stage is drawn, a stage without any window runs headless
+        self.window = None
+
+        # Colors of cells as drawn on window, by (line, column), and rectangles of window changed since last update
+        # Nothing has been drawn yet, so first drawing will be a whole one
+        self._drawn = None
+        self._dirty_rects = []
+
+        # States of cells at last ticks, kept until stage is drawn, with Unix time in nanoseconds when they are heard
+        # When ticks are computed ahead of time, a state is only drawn once its notes are heard
+        # Only latest state already heard is kept with states still to come, in a bounded queue
+        self._snapshots = deque(maxlen=self._MAX_SNAPSHOTS)
+
+        # Array renderer uses a pixel array, one pixel per cell, indexed by column then line like pygame surfaces
+        # Surfaces holding it at cell size and scaled to stage are built when stage is put on a theater
+        self._renderer = renderer
+        self._pixels = np.zeros((size, size, 3), dtype=np.uint8)
+        self._grid_surface = None
+        self._stage_surface = None
+
+        # Prepare vectorized engine if asked, otherwise instruments move their cells themselves
+        if engine == 'vector':
+            self._engine = Vector_engine(size)
+        else:
+            self._engine = None
+
+        # Number of ticks played since stage has been built, and numbers of instruments a cell was born in at last tick
+        self._tick = 0
+        self._births = []
+
+        # Profiler timing phases of ticks and drawing, if any, and name of stage prefixing phase names
+        self._profiler = None
+        self._name = 'stage'
+
+        # Cycle detection - states of cells reached since last birth, with index of their record by state key
+        # Records hold state reached and notes played at each tick, first one being state after birth, snapshots being
+        # built again from states when a cycle is replayed - records stop growing once their estimated size is too big
+        # Position is the index of record of current state while replaying a cycle, None when ticks are computed
+        self._memoize = memoize
+        self._states = {}
+        self._records = []
+        self._records_bytes = 0
+        self._cycle_start = None
+        self._position = None
+        self._computed = 0
+        self._replayed = 0
+        self._cycles = 0
+        self._cycle_ticks = 0
+
         # Compute cell width in pixels (we don't round to avoid calculation errors - is done further
         self._cell_width = width / size - padding / 2
 
-        # Initiate OSC client
-        self._osc_client = Osc_client()
+        # Get OSC clients of listeners notes are sent to from pool shared by all stages
+        self._osc_client = self._get_client(osc_url, osc_port)
+        self._osc_mirrors = [self._get_client(url, port) for url, port in (osc_mirrors or [])]
 
-        # Initialize random seed for eventual reproducibility
-        set_seed(seed)
+        # Random generator of stage and its instruments, seeded for eventual reproducibility
+        self._random = Random(seed)
 
     def _draw_cell(self, col, line, color):
         # Draw a cell at a given column and line in specified color
+        # Returns rectangle of window changed by drawing
 
         # Compute x and y pixel position based on line and column attributes and draw cell in specified color
         x = self._x + self._padding / 2 + int(line * (self._cell_width + self._padding / 2))
         y = self._y + self._padding / 2 + int(col * (self._cell_width + self._padding / 2))
 
         # Display cell
-        pygame.draw.rect(self.window, color, (x, y, self._cell_width - self._padding / 2, self._cell_width - self._padding / 2))
+        return pygame.draw.rect(self.window, color, (x, y, self._cell_width - self._padding / 2, self._cell_width - self._padding / 2))
 
-    def _draw_all(self):
-        # Draw whole stage
+    def _draw_all(self, frame):
+        # Draw whole stage from a dictionary giving color of each cell by (line, column)
 
         # Clear stage in background color and draw border
         pygame.draw.rect(self.window, self._background_color, (self._x, self._y, self._width, self._width))
         pygame.draw.lines(self.window, self._border_color, True, ((self._x, self._y), (self._width, self._y), (self._width, self._y + self._width), (self._x, self._y + self._width)))
 
-        # Loop through all instruments and draw their cells
+        # Loop through all cells and draw them
+        for (line, col), color in frame.items():
+            self._draw_cell(line, col, color)
+        self._dirty_rects.append(pygame.Rect(self._x, self._y, self._width + 1, self._width + 1))
+
+    def _draw_cells(self, line, col, colors):
+        # Draw stage cell by cell, only repainting cells whose position or color changed since previous drawing
+
+        # Get color of each position as it has to be displayed, a cell drawn after another one on same spot hides it
+        frame = dict(zip(zip(line.tolist(), col.tolist()), map(tuple, colors.tolist())))
+
+        # First drawing draws whole stage
+        if self._drawn is None:
+            self._draw_all(frame)
+
+        # Otherwise clear spots cells have left and draw cells that moved or changed color
+        else:
+            for position, color in self._drawn.items():
+                if position not in frame:
+                    self._dirty_rects.append(self._draw_cell(position[0], position[1], self._background_color))
+            for position, color in frame.items():
+                if self._drawn.get(position) != color:
+                    self._dirty_rects.append(self._draw_cell(position[0], position[1], color))
+        self._drawn = frame
+
+    def _draw_array(self, line, col, colors):
+        # Draw whole stage by writing color of each cell in a pixel array and scaling it to stage in one operation
+
+        # Clear pixel array in background color and write cells in it, a cell written after another one hides it
+        self._pixels[:] = self._background_color
+        self._pixels[col, line] = colors
+
+        # Scale pixel array to stage, inside its border, and draw border
+        pygame.surfarray.blit_array(self._grid_surface, self._pixels)
+        pygame.transform.scale(self._grid_surface, self._stage_surface.get_size(), self._stage_surface)
+        self.window.blit(self._stage_surface, (self._x + 1, self._y + 1))
+        pygame.draw.lines(self.window, self._border_color, True, ((self._x, self._y), (self._width, self._y), (self._width, self._y + self._width), (self._x, self._y + self._width)))
+        self._dirty_rects.append(pygame.Rect(self._x, self._y, self._width + 1, self._width + 1))
+
+    def _get_snapshot(self):
+        # Get a copy of state of all cells as needed to draw stage, instrument after instrument
+        # Snapshot is a (line, column, flash, collide, instrument number) tuple of NumPy arrays, one entry per cell
+        # Cells are not moved while a cycle is replayed, snapshot of current state is built from the recorded one
+
+        state = None if self._position is None else self._records[self._position][0]
+        if self._engine is not None:
+            line, col, _, _, flash, collide, instrument = self._engine.get_arrays() if state is None else state
+            order = np.argsort(instrument, kind='stable')
+            return line[order], col[order], flash[order], collide[order], instrument[order]
+
+        if state is None:
+            cells = [(cell.get_line(), cell.get_col(), cell.get_flash(), cell.get_collide(), number)
+                     for number, instrument in enumerate(self._instruments) for cell in instrument.get_cells()]
+        else:
+            cells = [(line, col, flash, collide, number) for number, instrument_state in enumerate(state)
+                     for line, col, _, _, flash, collide in instrument_state]
+        if not cells:
+            cells = np.empty((0, 5), dtype=np.int64)
+        line, col, flash, collide, instrument = np.array(cells, dtype=np.int64).T
+        return line, col, flash.astype(bool), collide.astype(bool), instrument
+
+    def _get_notes(self):
+        # Get notes to be played by each instrument as a list of (instrument, notes) tuples
+        # An instrument is only playing when one of its moving cell has reached a border (is so called flashing)
+        # Note played is picked from defined scale at position line + column
+
+        if self._engine is not None:
+            return self._engine.get_notes()
+
+        notes = []
         for instrument in self._instruments:
+            scale = instrument.get_scale()
+            instrument_notes = []
             for cell in instrument.get_cells():
-                self._draw_cell(cell.get_line(), cell.get_col(), instrument.get_color(cell.get_flash(), cell.get_collide()))
+                if cell.get_flash():
+                    instrument_notes.append(scale.get_note(cell.get_line() + cell.get_col()))
+            if instrument_notes:
+                notes.append((instrument, instrument_notes))
+        return notes
+
+    def _get_state(self):
+        # Get state of all cells as a (key, state) tuple, key being hashable and equal for equal states
+        # Birth cursors are left apart, as no birth happens while a cycle is replayed
+
+        if self._engine is not None:
+            state = self._engine.get_state()
+            return b''.join(array.tobytes() for array in state), state
+        state = tuple(instrument.get_state() for instrument in self._instruments)
+        return state, state
+
+    def _set_state(self, state):
+        # Set state of all cells, as given by _get_state
+
+        if self._engine is not None:
+            self._engine.set_state(state)
+        else:
+            for instrument, instrument_state in zip(self._instruments, state):
+                instrument.set_state(instrument_state)
+
+    def _is_birth_due(self):
+        # Tell if a cell of any instrument is born during next tick
+
+        return any(instrument.get_cursor() <= 1 for instrument in self._instruments)
+
+    def _get_state_bytes(self, key, state):
+        # Estimate size in bytes of a recorded state with its key
 
-    def _play(self):
-        # Prepare OSC messages to be sent to remote synthesiser
+        if self._engine is not None:
+            return 2 * len(key)
+        return self._CELL_STATE_BYTES * sum(len(instrument_state) for instrument_state in state)
 
-        # Loop through all instrumentss
+    def _record(self, born, notes):
+        # Record state reached by a computed tick and look for it among states reached since last birth
+        # Records start again from state reached by a tick where a cell has been born
+
+        if born or not self._records:
+            key, state = self._get_state()
+            self._states = {key: 0}
+            self._records = [(state, notes)]
+            self._records_bytes = self._get_state_bytes(key, state)
+        elif self._records_bytes < self._CYCLE_BYTES:
+            key, state = self._get_state()
+            self._records.append((state, notes))
+            self._records_bytes += self._get_state_bytes(key, state)
+            start = self._states.get(key)
+            if start is None:
+                self._states[key] = len(self._records) - 1
+
+            # Stage is back in a state it has already been in, ticks from this state on are a cycle
+            else:
+                self._cycle_start = start
+                self._position = start
+                self._cycles += 1
+                self._cycle_ticks += len(self._records) - 1 - start
+
+    def _replay(self):
+        # Play next tick of cycle from records instead of computing it, only birth cursors are moved
+        # Returns notes of tick
+
+        position = self._position + 1
+        _, notes = self._records[position]
+        self._position = self._cycle_start if position == len(self._records) - 1 else position
         for instrument in self._instruments:
+            instrument.skip_cursor(1)
+        self._replayed += 1
+        return notes
 
-            # Get scale associated to instrument
-            scale = instrument.get_scale()
+    def _get_detached(self):
+        # Get attributes tied to main process - window, surfaces, OSC clients, profiler - as they are in a stage copy
+        # advancing cells in a worker process, which gives notes but does not draw nor play
 
-            # Prepare OSC URL to route to the right synthesiser
-            osc_url = instrument.get_name()
+        return dict(window=None, _grid_surface=None, _stage_surface=None, _osc_client=None, _osc_mirrors=[],
+                    _drawn=None, _dirty_rects=[], _snapshots=deque(maxlen=self._MAX_SNAPSHOTS), _profiler=None)
 
-            # Prepare an array of notes to be played for this instrument
-            # An instrument is only playing when one of its moving cell has reached a border (is so called flashing)
-            # Note played is picked from defined scale at position line + column
-            osc_notes = []
-            for cell in instrument.get_cells():
-                if cell.get_flash():
-                    osc_notes.append(scale.get_note(cell.get_line() + cell.get_col()))
+    def __getstate__(self):
+        # Stages are copied to worker processes without anything tied to main process
+
+        state = self.__dict__.copy()
+        state.update(self._get_detached())
+        return state
+
+    def _get_client(self, url, port):
+        # Get client reaching an OSC listener from shared pool, created with stage's sending options if needed
+
+        return Osc_pool.get_client(url, port, queue_size=self._osc_queue, overflow=self._osc_overflow,
+                                   synths=self._osc_synths)
+
+    def _play(self, notes, timetag=None):
+        # Send notes to be played to remote synthesisers, using instrument's name as OSC URL to route to the right one
+        # Notes of all instruments are sent in a single bundle per listener, stamped with time of tick if it is known
+
+        if notes:
+            Osc_pool.send(self.get_messages(notes), timetag)
+
+    def get_messages(self, notes):
+        """
+        Get OSC messages to be sent for notes played during a tick
+        Notes of an instrument go to its own destinations if it has some, to stage's listener otherwise, and to all
+        mirrors of stage
+        :param notes: notes as returned by next_tick, a list of (instrument, notes) tuples
+        :return: a list of (client, url, notes) tuples, instrument's name being used as OSC URL
+        """
+
+        messages = []
+        for instrument, instrument_notes in notes:
+            destinations = instrument.get_destinations()
+            if destinations is None:
+                clients = [self._osc_client]
+            else:
+                clients = [self._get_client(url, port) for url, port in destinations]
+            for client in self._osc_mirrors:
+                if client not in clients:
+                    clients.append(client)
+            for client in clients:
+                messages.append((client, instrument.get_name(), instrument_notes))
+        return messages
+
+    def get_osc_client(self):
+        """
+        Get OSC client used to send notes of instruments of this stage without destinations of their own
+        :return: an Osc_client object
+        """
+
+        return self._osc_client
+
+    def detach(self):
+        """
+        Leave apart everything tied to main process - window, surfaces, OSC clients, profiler
+        Used by a stage copy advanced in a worker process, as copies made by forking main process keep all of it
+        """
+
+        self.__dict__.update(self._get_detached())
+
+    def get_tick(self):
+        """
+        Get number of ticks played since stage has been built
+        :return: number of next tick
+        """
+
+        return self._tick
+
+    def get_size(self):
+        """
+        Get size in cells of stage
+        :return: number of cells in a border of stage
+        """
+
+        return self._size
+
+    def get_births(self):
+        """
+        Get instruments a cell has been born in during last tick
+        A birth may be given for a full instrument where no free position was left, no cell being born then
+        :return: a list of instrument numbers, in order instruments have been added
+        """
+
+        return self._births
+
+    def fast_forward(self, ticks):
+        """
+        Advance stage a number of ticks at once, without drawing nor playing them
+        Ticks between births are skipped at once, ticks where a cell is born are computed as during a performance so
+        that stage ends up in the very same state as if all ticks had been played
+        :param ticks: number of ticks
+        """
+
+        self.reset_cycle()
+        while ticks > 0:
+
+            # Skip all ticks before next birth of any instrument
+            free = min([ticks] + [instrument.get_cursor() - 1 for instrument in self._instruments])
+            if free > 0:
+                if self._engine is not None:
+                    self._engine.skip(free)
+                else:
+                    for instrument in self._instruments:
+                        instrument.skip_cells(free)
+                for instrument in self._instruments:
+                    instrument.skip_cursor(free)
+                ticks -= free
+                self._tick += free
+
+            # Compute birth tick
+            else:
+                if self._engine is not None:
+                    self._engine.next_tick()
+                else:
+                    for instrument in self._instruments:
+                        instrument.next_tick()
+                ticks -= 1
+                self._tick += 1
+
+        # Show state reached at once
+        if self.window is not None:
+            self._snapshots.clear()
+            self._snapshots.append((time_ns(), self._get_snapshot()))
+
+    def seek(self, tick):
+        """
+        Advance stage up to a given tick, without drawing nor playing ticks before it
+        Used to start a performance in the middle of a piece
+        :param tick: number of tick to go to, a stage cannot go back in time
+        """
+
+        if tick < self._tick:
+            raise ValueError('Stage cannot seek back from tick %d to tick %d' % (self._tick, tick))
+        self.fast_forward(tick - self._tick)
+
+    def reset_cycle(self):
+        """
+        Forget states recorded to find a cycle, cells being set back in current state if a cycle is being replayed
+        Has to be called when instruments of stage are changed, as records would not be true anymore
+        """
 
-            # If there are notes to play, send a message to OSC listener
-            if osc_notes:
-                self._osc_client.send(osc_url, osc_notes)
+        if self._position is not None:
+            self._set_state(self._records[self._position][0])
+        self._states = {}
+        self._records = []
+        self._records_bytes = 0
+        self._cycle_start = None
+        self._position = None
+
+    def get_cycle_stats(self):
+        """
+        Get statistics of cycle detection
+        :return: a dictionary giving number of computed and replayed ticks, number of cycles found, their mean length and
+                 length of cycle being replayed, 0 if none
+        """
+
+        return {
+            'computed': self._computed,
+            'replayed': self._replayed,
+            'cycles': self._cycles,
+            'mean_cycle_length': self._cycle_ticks / self._cycles if self._cycles else 0,
+            'cycle_length': 0 if self._position is None else len(self._records) - 1 - self._cycle_start,
+        }
 
     def set_theater(self, window):
         """
         Used to associate pygame window object to this instrument for drawing features
         :param window: pygame window holder
         """
+        self.reset_cycle()
         self.window = window
+        self._drawn = None
+        if self._renderer == 'array':
+            self._grid_surface = pygame.Surface((self._size, self._size), 0, 32)
+            self._stage_surface = pygame.Surface((self._width - 1, self._width - 1), 0, 32)
+
+    def draw(self):
+        """
+        Draw latest state of stage on theater window, if it changed since last drawing
+        Drawing only reads a snapshot taken at last tick, so it may happen at its own pace, apart from ticks
+        :return: True if stage has been drawn
+        """
+
+        if self._profiler is None:
+            return self._draw()
+        mark = self._profiler.start()
+        drawn = self._draw()
+        self._profiler.add(self._name + '.draw', mark)
+        return drawn
+
+    def _draw(self):
+        # Draw latest state of stage, returns True if stage has been drawn
+
+        # Only keep latest state that is already heard
+        now = time_ns()
+        snapshot = None
+        while self._snapshots and self._snapshots[0][0] <= now:
+            snapshot = self._snapshots.popleft()[1]
+        if self.window is None or snapshot is None:
+            return False
+        line, col, flash, collide, instrument = snapshot
+
+        # Colors of cells are picked from a palette giving natural, flashing and colliding color of each instrument
+        palette = np.array([[instrument.get_color(False, False),
+                             instrument.get_color(True, False),
+                             instrument.get_color(False, True)] for instrument in self._instruments],
+                           dtype=np.uint8).reshape(-1, 3, 3)
+        colors = palette[instrument, np.where(flash, 1, np.where(collide, 2, 0))]
+
+        # Draw with chosen renderer
+        if self._renderer == 'array':
+            self._draw_array(line, col, colors)
+        else:
+            self._draw_cells(line, col, colors)
+        return True
+
+    def get_snapshot(self):
+        """
+        Get a compact copy of state of all cells as needed to draw stage, small enough to be sent between processes
+        :return: a (line, column, flash, collide, instrument number) tuple of NumPy arrays, one entry per cell
+        """
+
+        line, col, flash, collide, instrument = self._get_snapshot()
+        position_type = np.min_scalar_type(self._size)
+        return (line.astype(position_type), col.astype(position_type), flash, collide,
+                instrument.astype(np.min_scalar_type(len(self._instruments))))
+
+    def add_snapshot(self, snapshot, timetag=None):
+        """
+        Keep a snapshot taken elsewhere, by a copy of this stage in a worker process, to be drawn when it is heard
+        :param snapshot: a snapshot as given by get_snapshot
+        :param timetag: time when tick of snapshot is heard, as a Unix time in nanoseconds, now if not given
+        """
+
+        if self.window is not None:
+            self._keep_snapshot(snapshot, timetag)
+
+    def _keep_snapshot(self, snapshot, timetag):
+        # Keep a snapshot to draw once it is heard, forgetting snapshots already heard but latest one
+
+        now = time_ns()
+        while len(self._snapshots) > 1 and self._snapshots[1][0] <= now:
+            self._snapshots.popleft()
+        self._snapshots.append((now if timetag is None else timetag, snapshot))
+
+    def get_dirty_rects(self):
+        """
+        Get rectangles of window changed by drawing since last call, to update only those parts of display
+        :return: a list of pygame Rect objects
+        """
+
+        dirty_rects = self._dirty_rects
+        self._dirty_rects = []
+        return dirty_rects
+
+    def set_profiler(self, profiler, name):
+        """
+        Time phases of ticks and drawing of this stage
+        :param profiler: a Profiler object, None to stop timing
+        :param name: name of stage prefixing phase names, like stage0
+        """
+
+        self._profiler = profiler
+        self._name = name
+
+    def redraw(self):
+        """
+        Draw whole stage at next drawing, even cells that did not change
+        """
+
+        self._drawn = None
+
+    def _get_owner(self, instrument, parameter):
+        # Get object owning a parameter of an instrument, with its getter and setter names
+
+        if parameter not in self._PARAMETERS:
+            raise ValueError('Unknown parameter %s' % parameter)
+        owner, getter, setter = self._PARAMETERS[parameter]
+        instrument = self._instruments[instrument]
+        return instrument.get_scale() if owner == 'scale' else instrument, getter, setter
+
+    def get_parameter(self, instrument, parameter):
+        """
+        Get a parameter of an instrument
+        :param instrument: instrument number, in order instruments have been added
+        :param parameter: birth_rate, max_cells, scale or base
+        :return: value of parameter
+        """
+
+        owner, getter, setter = self._get_owner(instrument, parameter)
+        return getattr(owner, getter)()
+
+    def set_parameter(self, instrument, parameter, value):
+        """
+        Change a parameter of an instrument while playing
+        Objects are changed in place, and cycle records are forgotten as they are not true anymore
+        :param instrument: instrument number, in order instruments have been added
+        :param parameter: birth_rate (beats between births), max_cells (maximum number of cells), scale (name of base
+                          scale) or base (starting note of scale)
+        :param value: new value of parameter
+        """
+
+        owner, getter, setter = self._get_owner(instrument, parameter)
+        self.reset_cycle()
+        getattr(owner, setter)(value)
+        if parameter == 'max_cells' and self._engine is not None:
+            self._engine.trim(self._instruments[instrument])
+
+    def get_instruments(self):
+        """
+        Get instruments of stage
+        :return: a list of Instrument objects, in order they have been added
+        """
+
+        return self._instruments
 
     def add_instrument(self, instrument):
         """
         Add an instrument to stage
         :param instrumet: an Instrument object
         """
+        self.reset_cycle()
+        instrument.set_random(self._random)
         instrument.set_size(self._size)
         self._instruments.append(instrument)
+        if self._engine is not None:
+            self._engine.add_instrument(instrument)
 
-    def next_tick(self):
+    def next_tick(self, play=True, timetag=None):
         """
         Method to be fired when a tick occurs oat theater level
+        :param play: if False, notes are not sent to OSC listener but only returned
+        :param timetag: time when tick has to be heard, as a Unix time in nanoseconds, when it is computed ahead of time
+                        Notes are then sent in a bundle stamped with this time, at once otherwise
+        :return: notes played during this tick as a list of (instrument, notes) tuples
         """
-        # Loop through all populations
-        for population in self._instruments:
-            population.next_tick()
+        # Replay a cycle as long as no cell is born, cells are then set back in their state to compute birth tick
+        profiler = self._profiler
+        mark = None if profiler is None else profiler.start()
+        if self._position is not None and not self._is_birth_due():
+            notes = self._replay()
+            snapshot = None if self.window is None else self._get_snapshot()
+            self._births = []
+            if profiler is not None:
+                mark = profiler.add(self._name + '.replay', mark)
+        else:
+            if self._position is not None:
+                self.reset_cycle()
+            self._births = [number for number, instrument in enumerate(self._instruments)
+                            if instrument.get_cursor() <= 1]
+            born = bool(self._births)
+
+            # Move all cells, either all at once or population after population
+            if self._engine is not None:
+                self._engine.next_tick(profiler, self._name)
+            else:
+                for population in self._instruments:
+                    population.next_tick(profiler, None if profiler is None
+                                         else self._name + '.' + population.get_name())
+            self._computed += 1
+
+            # Get state of stage for next drawing if it has been put in a theater window, and notes
+            # from cells that have reached an edge
+            if profiler is not None:
+                mark = profiler.start()
+            snapshot = None if self.window is None else self._get_snapshot()
+            if profiler is not None:
+                mark = profiler.add(self._name + '.snapshot', mark)
+            notes = self._get_notes()
+            if self._memoize:
+                self._record(born, notes)
+            if profiler is not None:
+                mark = profiler.add(self._name + '.notes', mark)
 
-        # Draw whole stage
-        self._draw_all()
+        self._tick += 1
 
-        # Play notes from cells that have reached an edge
-        self._play()
\ No newline at end of file
+        # Keep state of stage for next drawing and play notes
+        if self.window is not None:
+            self._keep_snapshot(snapshot, timetag)
+        if play:
+            self._play(notes, timetag)
+            if profiler is not None:
+                profiler.add(self._name + '.play', mark)
+        return notes
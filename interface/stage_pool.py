@@ -0,0 +1,107 @@
+import multiprocessing
+
+def _work(connection, stages):
+    # Worker process loop - advance stages a number of ticks on each request and send back what they played
+    # For each tick and stage, result is a list of (instrument number, notes) tuples, a snapshot if drawing is asked and
+    # numbers of instruments a cell has been born in
+
+    # Stages copied by forking main process still hold its window, OSC clients and profiler, which are left apart so
+    # that snapshots do not pile up and phases are not timed for nothing
+    for stage in stages:
+        stage.detach()
+    numbers = [{id(instrument): number for number, instrument in enumerate(stage.get_instruments())}
+               for stage in stages]
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        ticks, draw, changes = request
+        for stage, instrument, parameter, value in changes:
+            stages[stage].set_parameter(instrument, parameter, value)
+        results = []
+        for tick in range(ticks):
+            for stage, instrument_numbers in zip(stages, numbers):
+                notes = [(instrument_numbers[id(instrument)], instrument_notes)
+                         for instrument, instrument_notes in stage.next_tick(play=False)]
+                results.append((notes, stage.get_snapshot() if draw else None, stage.get_births()))
+        connection.send(results)
+    connection.close()
+
+class Stage_pool:
+    """
+    Class used to advance stages in worker processes, so that many stages share all cores of a computer
+    Each worker holds copies of some stages and advances them when asked to, sending back notes and compact snapshots
+    Stages of main process keep being used to draw and to send notes, but their cells are not moved anymore
+    """
+
+    def __init__(self, stages, workers):
+        """
+        Class constructor - copies stages in their current state to workers and starts workers
+        On platforms starting processes by spawning them, scripts using a pool must be guarded by if __name__ == '__main__'
+        :param stages: a list of Stage objects
+        :param workers: number of worker processes, stages are dealt to them in turn
+        """
+
+        # Store class properties
+        self._stages = stages
+        workers = max(1, min(workers, len(stages)))
+
+        # Each worker owns a pipe to receive requests and send results, stage at index i is handled by worker i % workers
+        # Stages take their random generator with them, so they play the same way whatever worker they are on
+        self._connections = []
+        self._processes = []
+        for worker in range(workers):
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_work, name='Stage_pool worker %d' % worker, daemon=True,
+                                              args=(worker_connection, stages[worker::workers]))
+            process.start()
+            worker_connection.close()
+            self._connections.append(connection)
+            self._processes.append(process)
+
+    def next_tick(self, ticks=1, draw=False, changes=None):
+        """
+        Advance all stages a number of ticks, all workers working at the same time
+        :param ticks: number of ticks
+        :param draw: if True, workers also send snapshots needed to draw stages
+        :param changes: parameters of instruments changed before first tick, as a list of (stage number, instrument
+                        number, parameter, value) tuples - see Stage.set_parameter
+        :return: a list holding for each tick a list holding for each stage a (notes, snapshot, births) tuple - notes
+                 being a list of (instrument, notes) tuples with instruments of main process stages, births a list of
+                 instrument numbers
+        """
+
+        workers = len(self._connections)
+        worker_changes = [[] for worker in range(workers)]
+        for stage, instrument, parameter, value in changes or []:
+            worker_changes[stage % workers].append((stage // workers, instrument, parameter, value))
+        for connection, connection_changes in zip(self._connections, worker_changes):
+            connection.send((ticks, draw, connection_changes))
+        results = [connection.recv() for connection in self._connections]
+
+        # Put results back in order of stages, tick after tick
+        played = []
+        for tick in range(ticks):
+            tick_played = []
+            for number, stage in enumerate(self._stages):
+                worker = number % workers
+                stages = len(self._stages[worker::workers])
+                notes, snapshot, births = results[worker][tick * stages + number // workers]
+                instruments = stage.get_instruments()
+                tick_played.append(([(instruments[instrument], instrument_notes)
+                                     for instrument, instrument_notes in notes], snapshot, births))
+            played.append(tick_played)
+        return played
+
+    def close(self):
+        """
+        Stop all workers
+        """
+
+        for connection in self._connections:
+            connection.send(None)
+            connection.close()
+        for process in self._processes:
+            process.join()
+        self._connections = []
+        self._processes = []
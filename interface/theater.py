@@ -1,7 +1,11 @@
 import pygame
 from pygame.locals import QUIT
 import sys
+from time import perf_counter_ns
 from .lpd8 import LPD8_Events
+from .osc_pool import Osc_pool
+from .scheduler import Scheduler
+from .stage_pool import Stage_pool
 
 class Theater:
     """
@@ -11,13 +15,39 @@ class Theater:
     """
 
 
-    def __init__(self, width, height, tempo=120, color=(0, 0, 0), midi=None):
+    # Number of phases shown by profiling overlay, slowest first
+    _OVERLAY_LINES = 12
+
+    # Maximum number of ticks fired without drawing a frame, even when drawing could delay next tick
+    _MAX_TICKS_WITHOUT_FRAME = 16
+
+    # OSC URL of probe messages, holding tick number and Unix time in nanoseconds when tick is due
+    _PROBE_URL = 'boing/tick'
+
+    def __init__(self, width, height, tempo=120, color=(0, 0, 0), midi=None, headless=False, fps=60, lookahead=0.0,
+                 workers=0, profiler=None, overlay=False, probe=False, recorder=None, replay=None, bindings=None,
+                 debug=False):
         """
         Class constructor
         :param width: width of theater window in pixels
         :param height: height of theater window in pixels
         :param tempo: tempo in beats per second (BPM) - sets interval between two notes, not two ticks
         :param color: background color of theater expressed in a RGB triplet
+        :param midi: a LPD8 object used as MIDI controller
+        :param headless: if True, no window is opened and stages are never drawn
+        :param fps: maximum number of frames drawn per second, drawing happens apart from ticks
+        :param lookahead: in seconds - when not zero, ticks are computed this long before their time and their notes
+                          are sent in bundles stamped with it, for the synthesiser to play them exactly on time
+        :param workers: when not zero, stages are advanced by this number of worker processes, once performance starts
+        :param profiler: a Profiler object timing phases of ticks and frames of all stages, if given
+        :param overlay: if True, statistics of slowest phases timed by profiler are shown over top left of window
+        :param probe: if True, every tick sends a /boing/tick message holding tick number and Unix time in nanoseconds
+                      when tick is due to all OSC listeners but SuperCollider servers, to measure latency of notes
+        :param recorder: a Recorder object writing ticks and controller events of performance to a log, if given
+        :param replay: a Recording object - if given, notes and frames of stages are read from its log instead of being
+                       computed, stages being built like recorded ones
+        :param bindings: a Bindings object changing parameters of performance from controller events, if given
+        :param debug: if True, controller events are printed as they are handled
         """
 
         # Store class properties
@@ -29,68 +59,329 @@ class Theater:
         # Store different stages added to this theater
         self._stages = []
 
-        # Start pygame engine and init drawing window
-        pygame.init()
-        self._window = pygame.display.set_mode((width, height))
-        pygame.display.set_caption("BOING - Automated music generator")
+        # Start pygame engine and init drawing window, unless running without any display
+        if headless:
+            self._window = None
+        else:
+            pygame.init()
+            self._window = pygame.display.set_mode((width, height))
+            pygame.display.set_caption("BOING - Automated music generator")
 
-        # Controls main loop refresh rate and tempo
-        self._clock = pygame.time.Clock()
+        # Controls tempo, ticks being fired at steady deadlines, eventually ahead of time
         self._delay = 60000 / tempo
-        self._next_tick = 0
-        self._current_step = 0;
+        self._lookahead = lookahead
+        self._scheduler = Scheduler(tempo, lookahead=lookahead)
+
+        # Controls rendering rate - rendering is skipped when it could delay next tick
+        # Time a frame takes is estimated from last one, estimate going down while frames are skipped
+        self._frame_delay = round(1000000000 / fps)
+        self._next_frame = 0
+        self._render_time = 0
+        self._frame_tick = 0
+
+        # Worker processes advancing stages, started with first tick
+        self._workers = workers
+        self._pool = None
+
+        # Profiler and overlay showing its statistics, refreshed every second
+        self._profiler = profiler
+        self._overlay = overlay and profiler is not None and self._window is not None
+        self._overlay_surface = None
+        self._next_overlay = 0
+        self._font = None
+
+        # Sends probe messages with notes
+        self._probe = probe
+
+        # Number of next tick, log where performance is recorded and log it is replayed from
+        self._tick = 0
+        self._recorder = recorder
+        self._replay = replay
 
-        # Starts MIDI communication
+        # Starts MIDI communication, controller events changing parameters through bindings
         self._midi = midi
+        self._bindings = bindings
+        self._debug = debug
 
     def _loop(self):
         # Theater main loop
 
         # This flag is used to keep main loop running
+        self._scheduler.start()
         while self.running:
 
-            # Check if there is MIDI input
-            self._midi.get_messages()
+            # Check if there is MIDI input, controller events being handled before due ticks are fired so that their
+            # changes are applied from next tick on
+            if self._midi is not None:
+                mark = None if self._profiler is None else self._profiler.start()
+                self._midi.get_messages()
+                if self._profiler is not None:
+                    self._profiler.add('midi', mark)
+            if self._profiler is not None:
+                self._profiler.poll()
 
             # Typical pygame event, controls end of program when closing window
-            for event in pygame.event.get():
+            for event in (pygame.event.get() if self._window is not None else []):
+                if self._recorder is not None and self._replay is None:
+                    self._record_event(event)
+                if self._bindings is not None:
+                    self._bindings.handle(event)
                 if event.type == QUIT:
-                    self._midi.close()
+                    if self._midi is not None:
+                        self._midi.close()
+                    self._close()
+                    self._print_timing()
                     pygame.quit()
                     sys.exit()
-                if event.type == LPD8_Events.LPD8_PGM_CHG:
-                    print('*** PGM_CHG *** PGM: ' + str(event.pgm) + ' BANK: ' + str(event.bank))
-                if event.type == LPD8_Events.LPD8_CTRL:
-                    print('*** CTRL *** PGM: ' + str(event.pgm) + ' BANK: ' + str(event.bank)  + ' CTRL: ' + str(event.ctrl) + ' VALUE: ' +  str(event.value))
-                if event.type == LPD8_Events.LPD8_NOTE_ON:
-                    print('*** NOTE_ON *** PGM: ' + str(event.pgm) + ' BANK: ' + str(event.bank)  + ' NOTE: ' + str(event.note) + ' VELOCITY: ' +  str(event.velocity))
-                if event.type == LPD8_Events.LPD8_NOTE_OFF:
-                    print('*** NOTE_OFF *** PGM: ' + str(event.pgm) + ' BANK: ' + str(event.bank)  + ' NOTE: ' + str(event.note))
-
-            # When it is time to perform an action
-            if self._tick():
-
-                # Look for all stages and trigger changes
-                for stage in self._stages:
-                    stage.next_tick()
-
-                # Update window display
-                pygame.display.update()
-
-            # Set framerate to 60 FPS
-            self._clock.tick(60)
-
-    def _tick(self):
-        # Keep an eye on elapsed time and return true if it is time to trigger an action
-        # A tick is triggered every time the amount of computed delay has been reached
-
-        # Get current time and compare it to stored next time when a tick will occur
-        current_time = pygame.time.get_ticks()
-        if self._next_tick <= current_time:
-            self._next_tick = current_time + self._delay
-            return True
+                if self._debug:
+                    self._print_event(event)
+
+            # Fire all ticks that are due, notes are sent at once, stamped with time of tick when computed ahead of time
+            tick = self._scheduler.poll()
+            while tick is not None:
+                self._next_tick(self._scheduler.get_wall_time(tick) if self._lookahead else None, tick=tick)
+                tick = self._scheduler.poll()
+
+            # Draw latest state of stages at their own frame rate, as long as it lets next tick happen on time
+            # A single slow frame must not stop drawing, so a skipped frame lowers time a frame is thought to take,
+            # and a frame is drawn anyway after too many ticks without one
+            if self._window is not None and perf_counter_ns() >= self._next_frame:
+                if (self._scheduler.time_left() > self._render_time
+                        or self._tick - self._frame_tick >= self._MAX_TICKS_WITHOUT_FRAME):
+                    self._render()
+                else:
+                    self._render_time -= self._render_time // 4
+
+            # Sleep until next tick or next frame is due, whichever comes first
+            # A frame skipped to let next tick happen on time is only considered again once tick is fired
+            wake = self._scheduler.get_fire_time()
+            if self._window is not None and perf_counter_ns() < self._next_frame:
+                wake = min(wake, self._next_frame)
+            self._scheduler.wait(wake)
+
+        # Performance is over, notes still queued are sent
+        self._close()
+
+    def _next_tick(self, timetag=None, play=True, tick=None):
+        # Trigger a tick on all stages and send notes of all of them in a single bundle per OSC listener
+        # Stages are advanced in worker processes when asked to, their snapshots being kept here for drawing
+        # Ticks are read from a log instead when replaying one, and written to a log when recording
+        # Parameters changed by controller since previous tick are changed first, in worker processes too
+        # Probe messages are added to bundles when asked to and tick number is known
+        # Returns notes played by each stage, None once a replayed log is over
+
+        mark = None if self._profiler is None else self._profiler.start()
+        if self._workers and self._replay is None and self._pool is None:
+            self._pool = Stage_pool(self._stages, self._workers)
+        changes = [] if self._bindings is None else self._apply_changes(self._bindings.get_changes(self))
+        if self._replay is not None:
+            played = self._replay_tick(timetag)
+            if played is None:
+                self.running = False
+                return None
+        elif self._pool is not None:
+            frames = self._recorder is not None and self._recorder.has_frames()
+            played = []
+            records = []
+            for stage, (notes, snapshot, births) in zip(self._stages,
+                                                        self._pool.next_tick(draw=self._window is not None
+                                                                             or frames, changes=changes)[0]):
+                if snapshot is not None:
+                    stage.add_snapshot(snapshot, timetag)
+                played.append(notes)
+                records.append((births, snapshot))
+            if self._recorder is not None:
+                self._record_tick(played, records)
         else:
-            return False
+            played = [stage.next_tick(False, timetag) for stage in self._stages]
+            if self._recorder is not None:
+                frames = self._recorder.has_frames()
+                self._record_tick(played, [(stage.get_births(), stage.get_snapshot() if frames else None)
+                                           for stage in self._stages])
+        self._tick += 1
+        if self._profiler is not None:
+            self._profiler.add('stages', mark)
+
+        mark = None if self._profiler is None else self._profiler.start()
+        messages = []
+        if play:
+            for stage, notes in zip(self._stages, played):
+                if notes:
+                    messages.extend(stage.get_messages(notes))
+        if play and self._probe and tick is not None:
+            probe = [tick, self._scheduler.get_wall_time(tick)]
+            for client in Osc_pool.get_clients():
+                if not client.is_scsynth():
+                    messages.append((client, self._PROBE_URL, probe))
+        if messages:
+            Osc_pool.send(messages, timetag)
+        if self._profiler is not None:
+            self._profiler.add('osc', mark)
+        return played
+
+    def _apply_changes(self, changes):
+        # Apply parameter changes to theater and stages of main process
+        # Returns changes of stages, to be applied to their copies in worker processes
+
+        stage_changes = []
+        for stage, instrument, parameter, value in changes:
+            if parameter == 'tempo':
+                self.set_tempo(value)
+            else:
+                self._stages[stage].set_parameter(instrument, parameter, value)
+                stage_changes.append((stage, instrument, parameter, value))
+        return stage_changes
+
+    def _record_tick(self, played, records):
+        # Record notes played by each stage during a tick, with cells born and snapshot taken, if any
+
+        stages = []
+        for stage, notes, (births, snapshot) in zip(self._stages, played, records):
+            instruments = stage.get_instruments()
+            stages.append((births, [(instruments.index(instrument), instrument_notes)
+                                    for instrument, instrument_notes in notes], snapshot))
+        self._recorder.add_tick(self._tick, stages)
+
+    def _record_event(self, event):
+        # Record a controller event, events of other types are left apart
+
+        if event.type == LPD8_Events.LPD8_PGM_CHG:
+            self._recorder.add_control(event.type - LPD8_Events.LPD8_PGM_CHG, event.pgm, event.bank)
+        elif event.type == LPD8_Events.LPD8_NOTE_ON:
+            self._recorder.add_control(event.type - LPD8_Events.LPD8_PGM_CHG, event.pgm, event.bank, event.note,
+                                       event.velocity)
+        elif event.type == LPD8_Events.LPD8_NOTE_OFF:
+            self._recorder.add_control(event.type - LPD8_Events.LPD8_PGM_CHG, event.pgm, event.bank, event.note)
+        elif event.type == LPD8_Events.LPD8_CTRL:
+            self._recorder.add_control(event.type - LPD8_Events.LPD8_PGM_CHG, event.pgm, event.bank, event.ctrl,
+                                       event.value)
+
+    def _replay_tick(self, timetag=None):
+        # Read next tick from replayed log, keeping its frames for drawing and posting its controller events again
+        # Tempo changes are heard from this tick on, like when performance was recorded
+        # Returns notes played by each stage, None at end of log
+
+        record = self._replay.next_tick()
+        if record is None:
+            return None
+        tick, controls, stages = record
+        if self._replay.get_tempo() != self._tempo:
+            self.set_tempo(self._replay.get_tempo())
+        if self._window is not None:
+            for event, program, bank, number, value in controls:
+                event += LPD8_Events.LPD8_PGM_CHG
+                if event == LPD8_Events.LPD8_PGM_CHG:
+                    attributes = {'pgm': program, 'bank': bank}
+                elif event == LPD8_Events.LPD8_NOTE_ON:
+                    attributes = {'pgm': program, 'bank': bank, 'note': number, 'velocity': value}
+                elif event == LPD8_Events.LPD8_NOTE_OFF:
+                    attributes = {'pgm': program, 'bank': bank, 'note': number}
+                else:
+                    attributes = {'pgm': program, 'bank': bank, 'ctrl': number, 'value': value}
+                pygame.event.post(pygame.event.Event(event, attributes))
+        played = []
+        for stage, (births, notes, snapshot) in zip(self._stages, stages):
+            if snapshot is not None:
+                stage.add_snapshot(snapshot, timetag)
+            instruments = stage.get_instruments()
+            played.append([(instruments[instrument], instrument_notes) for instrument, instrument_notes in notes])
+        return played
+
+    def _render(self):
+        # Draw stages that changed since last frame and update window display, only where stages changed
+        # Time spent is kept to know if next frame may be drawn before next tick
+
+        start = perf_counter_ns()
+        dirty_rects = []
+        for stage in self._stages:
+            stage.draw()
+            dirty_rects.extend(stage.get_dirty_rects())
+        if self._overlay:
+            dirty_rects.append(self._draw_overlay())
+        if dirty_rects:
+            mark = perf_counter_ns()
+            pygame.display.update(dirty_rects)
+            if self._profiler is not None:
+                self._profiler.add('display', mark)
+        self._render_time = perf_counter_ns() - start
+        self._next_frame = start + self._frame_delay
+        self._frame_tick = self._tick
+
+    def _draw_overlay(self):
+        # Draw statistics of slowest phases over top left corner of window, text being rendered again every second
+        # Stages are drawn whole after text changed, to clear parts of them hidden by previous text
+        # Returns rectangle of window changed
+
+        now = perf_counter_ns()
+        if now >= self._next_overlay:
+            self._next_overlay = now + 1000000000
+            if self._font is None:
+                self._font = pygame.font.Font(None, 16)
+            stats = sorted(self._profiler.get_stats().items(), key=lambda item: item[1]['p99_ms'], reverse=True)
+            rows = [('phase (ms)', 'p50', 'p99', 'max')]
+            for name, phase in stats[:self._OVERLAY_LINES]:
+                rows.append((name, '%.3f' % phase['p50_ms'], '%.3f' % phase['p99_ms'], '%.3f' % phase['max_ms']))
+
+            # Text is laid out in columns, phase names aligned left and durations aligned right
+            texts = [[self._font.render(text, True, (255, 255, 0)) for text in row] for row in rows]
+            widths = [max(row[column].get_width() for row in texts) + 8 for column in range(4)]
+            height = texts[0][0].get_height()
+            self._overlay_surface = pygame.Surface((sum(widths), height * len(texts)))
+            for line, row in enumerate(texts):
+                x = 0
+                for column, text in enumerate(row):
+                    self._overlay_surface.blit(text, (x if column == 0 else x + widths[column] - text.get_width(),
+                                                      line * height))
+                    x += widths[column]
+            for stage in self._stages:
+                stage.redraw()
+        return self._window.blit(self._overlay_surface, (0, 0))
+
+    def _close(self):
+        # Send notes still waiting to be sent, stop OSC senders and worker processes, dump last profiling statistics
+
+        Osc_pool.close()
+        if self._recorder is not None:
+            self._recorder.flush()
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+        if self._profiler is not None:
+            self._profiler.dump()
+
+    def _print_event(self, event):
+        # Print a controller event, events of other types are left apart
+
+        if event.type == LPD8_Events.LPD8_PGM_CHG:
+            print('*** PGM_CHG *** PGM: ' + str(event.pgm) + ' BANK: ' + str(event.bank))
+        if event.type == LPD8_Events.LPD8_CTRL:
+            print('*** CTRL *** PGM: ' + str(event.pgm) + ' BANK: ' + str(event.bank)  + ' CTRL: ' + str(event.ctrl) + ' VALUE: ' +  str(event.value))
+        if event.type == LPD8_Events.LPD8_NOTE_ON:
+            print('*** NOTE_ON *** PGM: ' + str(event.pgm) + ' BANK: ' + str(event.bank)  + ' NOTE: ' + str(event.note) + ' VELOCITY: ' +  str(event.velocity))
+        if event.type == LPD8_Events.LPD8_NOTE_OFF:
+            print('*** NOTE_OFF *** PGM: ' + str(event.pgm) + ' BANK: ' + str(event.bank)  + ' NOTE: ' + str(event.note))
+
+    def _print_timing(self):
+        # Print how late ticks have been fired during performance
+
+        stats = self._scheduler.get_stats()
+        print('Ticks: %d - overruns: %d - lateness mean: %.3f ms, max: %.3f ms - restarts: %d'
+              % (stats['ticks'], stats['overruns'], stats['mean_lateness_ms'], stats['max_lateness_ms'],
+                 stats['restarts']))
+        if self._midi is not None:
+            stats = self._midi.get_stats()
+            print('MIDI: %d messages - events posted: %d - knob events coalesced: %d'
+                  % (stats['read'], stats['posted'], stats['coalesced']))
+        if self._bindings is not None:
+            stats = self._bindings.get_stats()
+            print('Bindings: %d controller events - changes applied: %d' % (stats['events'], stats['changes']))
+        for client in Osc_pool.get_clients():
+            stats = client.get_cache_stats()
+            print('OSC %s cache: %d messages - hits: %d - misses: %d'
+                  % (client.get_address(), stats['size'], stats['hits'], stats['misses']))
+            stats = client.get_transport_stats()
+            print('OSC %s transport: %d sent - dropped: %d - errors: %d - queue depth max: %d'
+                  % (client.get_address(), stats['sent'], stats['dropped'], stats['errors'], stats['max_depth']))
 
     def start_performance(self):
         """
@@ -106,10 +397,99 @@ class Theater:
         """
         self.running = False
 
+    def get_timing(self):
+        """
+        Get timing statistics of current performance, telling how late ticks have been fired
+        :return: a dictionary of statistics, times in milliseconds
+        """
+
+        return self._scheduler.get_stats()
+
+    def get_profiler(self):
+        """
+        Get profiler timing phases of ticks and frames
+        :return: a Profiler object, None if theater is not profiled
+        """
+
+        return self._profiler
+
+    def get_tempo(self):
+        """
+        Get theater's tempo
+        :return: tempo in ticks per minute
+        """
+
+        return self._tempo
+
+    def set_tempo(self, tempo):
+        """
+        Change theater's tempo while playing, next tick staying due at the same time
+        Tempo change is recorded with next tick, if performance is recorded
+        :param tempo: tempo in ticks per minute
+        """
+
+        self._tempo = tempo
+        self._delay = 60000 / tempo
+        self._scheduler.set_tempo(tempo)
+        if self._recorder is not None and self._replay is None:
+            self._recorder.add_tempo(tempo)
+
+    def get_stages(self):
+        """
+        Get stages of theater
+        :return: a list of Stage objects, in order they have been added
+        """
+
+        return self._stages
+
+    def get_tick_duration(self):
+        """
+        Get duration of a tick, derived from theater's tempo
+        :return: duration of a tick in seconds
+        """
+
+        return self._delay / 1000
+
+    def seek(self, tick):
+        """
+        Advance all stages up to a given tick at once, without drawing nor playing ticks before it
+        Used to start a performance in the middle of a piece, before it starts when stages are advanced by workers
+        A replayed log is read from this tick on, at tempo of this tick
+        :param tick: number of tick to go to
+        """
+
+        if self._replay is not None:
+            self._replay.seek(tick)
+            self.set_tempo(self._replay.get_tempo())
+        else:
+            for stage in self._stages:
+                stage.seek(tick)
+        self._tick = tick
+
+    def run(self, ticks, play=False):
+        """
+        Step a given number of ticks as fast as possible, without waiting for tempo nor updating window display
+        Used to run a performance headless, to pre-compute material or to test
+        :param ticks: number of ticks to step
+        :param play: if True, notes are also sent to OSC listeners as during a performance
+        :return: an iterator on (tick number, stage number, instrument, notes) tuples, one for each instrument playing
+        """
+
+        for tick in range(ticks):
+            played = self._next_tick(play=play)
+            if played is None:
+                return
+            for number, notes in enumerate(played):
+                for instrument, instrument_notes in notes:
+                    yield tick, number, instrument, instrument_notes
+
     def add_stage(self, stage):
         """
         Add a stage to the theater, where instruments can perform
-        :param stage: a Stage object
+        :param stage: a Stage object, built like recorded stage when replaying a log
         """
+        if self._replay is not None:
+            self._replay.prepare_stage(len(self._stages), stage)
         stage.set_theater(self._window)
+        stage.set_profiler(self._profiler, 'stage%d' % len(self._stages))
         self._stages.append(stage)
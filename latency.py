@@ -0,0 +1,150 @@
+import argparse
+import json
+import os
+import socket
+import statistics
+import threading
+from time import time_ns
+
+# Keep pygame's banner out of measures
+os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
+
+from pythonosc.osc_packet import OscPacket, ParseError
+from interface.theater import Theater
+from main import build_stage, THEATER_WIDTH, THEATER_HEIGHT, STAGE_SIZE, TEMPO, SEED, OSC_URL, OSC_PORT
+
+# Measures delay between the time a tick is due and the time its OSC bundle reaches the synthesiser
+# A local UDP receiver stands in for SuperCollider on OSC port while the performance of main.py plays in real time,
+# without window, every tick sending a probe message holding tick number and time tick is due
+# Latency is arrival time minus due time - negative when ticks are computed ahead of time with a lookahead
+
+class Receiver:
+    """
+    Class used to stand in for an OSC listener, stamping every received message with its arrival time
+    """
+
+    def __init__(self, host, port):
+        """
+        Class constructor - binds a socket to OSC listener address and starts receiving in a background thread
+        :param host: address to listen on
+        :param port: port to listen on
+        """
+
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind((host, port))
+        self._socket.settimeout(0.2)
+        self._running = True
+        self._probes = []
+        self._messages = 0
+        self._errors = 0
+        self._thread = threading.Thread(target=self._receive, name='Latency receiver', daemon=True)
+        self._thread.start()
+
+    def _receive(self):
+        # Receive datagrams until stopped, keeping probes with their arrival time
+
+        while self._running:
+            try:
+                datagram = self._socket.recv(65536)
+            except socket.timeout:
+                continue
+            arrival = time_ns()
+            try:
+                packet = OscPacket(datagram)
+            except ParseError:
+                self._errors += 1
+                continue
+            for timed in packet.messages:
+                self._messages += 1
+                if timed.message.address == '/boing/tick':
+                    tick, due = timed.message.params
+                    self._probes.append((tick, due, arrival))
+
+    def stop(self):
+        """
+        Stop receiving, after a short while to let last datagrams arrive
+        :return: a (probes, number of messages, number of unreadable datagrams) tuple - probes being a list of
+                 (tick number, due time, arrival time) tuples in order of arrival, times in nanoseconds
+        """
+
+        self._running = False
+        self._thread.join()
+        self._socket.close()
+        return self._probes, self._messages, self._errors
+
+def percentile(values, ratio):
+    # Get value below which given ratio of sorted values fall
+
+    return values[min(len(values) - 1, int(ratio * len(values)))]
+
+def report(probes, ticks):
+    """
+    Compute latency distribution, jitter, drops and reorders of probes
+    :param probes: a list of (tick number, due time, arrival time) tuples in order of arrival
+    :param ticks: number of ticks fired
+    :return: a dictionary of measures, times in milliseconds
+    """
+
+    latencies = [(arrival - due) / 1000000 for tick, due, arrival in probes]
+    ordered = sorted(latencies)
+    seen = set()
+    duplicates = 0
+    reordered = 0
+    last = -1
+    for tick, due, arrival in probes:
+        if tick in seen:
+            duplicates += 1
+        seen.add(tick)
+        if tick < last:
+            reordered += 1
+        last = max(last, tick)
+    return {
+        'ticks': ticks,
+        'received': len(probes),
+        'dropped': ticks - len(seen),
+        'duplicates': duplicates,
+        'reordered': reordered,
+        'latency_min_ms': ordered[0] if ordered else None,
+        'latency_p50_ms': percentile(ordered, 0.50) if ordered else None,
+        'latency_p99_ms': percentile(ordered, 0.99) if ordered else None,
+        'latency_max_ms': ordered[-1] if ordered else None,
+        'latency_mean_ms': statistics.fmean(latencies) if latencies else None,
+        'jitter_std_ms': statistics.pstdev(latencies) if latencies else None,
+        'jitter_mean_delta_ms': statistics.fmean(abs(b - a) for a, b in zip(latencies, latencies[1:]))
+                                if len(latencies) > 1 else None,
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure latency and jitter of BoInG! notes with a local OSC receiver')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of performance measured')
+    parser.add_argument('--tempo', type=float, default=None, help='ticks per minute, tempo of main.py if not given')
+    parser.add_argument('--size', type=int, default=STAGE_SIZE, help='number of cells in a border of the stage')
+    parser.add_argument('--seed', type=int, default=SEED, help='seed of random births')
+    parser.add_argument('--engine', choices=['vector'], default=None, help='move cells with the vectorized engine')
+    parser.add_argument('--lookahead', type=float, default=0.0, help='seconds ticks are computed ahead of time')
+    parser.add_argument('--queue', type=int, default=0, help='size of OSC sending queue, 0 to send at once')
+    parser.add_argument('--workers', type=int, default=0, help='advance stages in this number of worker processes')
+    parser.add_argument('--output', default=None, help='JSON file where to write measures')
+    args = parser.parse_args()
+
+    # Stand in for SuperCollider before any note is sent
+    receiver = Receiver(OSC_URL, OSC_PORT)
+
+    # Play in real time, without window nor MIDI controller, for given duration
+    tempo = args.tempo if args.tempo is not None else TEMPO * (args.size - 1)
+    theater = Theater(THEATER_WIDTH, THEATER_HEIGHT, tempo, headless=True, lookahead=args.lookahead,
+                      workers=args.workers, probe=True)
+    theater.add_stage(build_stage(args.size, args.seed, args.engine, osc_queue=args.queue))
+    threading.Timer(args.duration, theater.stop_performance).start()
+    theater.start_performance()
+
+    # Report
+    probes, messages, errors = receiver.stop()
+    measures = report(probes, theater.get_timing()['ticks'])
+    measures.update(messages=messages, unreadable=errors, tempo=tempo, lookahead=args.lookahead, queue=args.queue,
+                    scheduler=theater.get_timing())
+    for name, value in measures.items():
+        print('%-22s %s' % (name, '%.3f' % value if isinstance(value, float) else value))
+    if args.output is not None:
+        with open(args.output, 'w') as output:
+            json.dump(measures, output, indent=2)
@@ -1,4 +1,5 @@
 from interface.lpd8 import LPD8
+from interface.bindings import Bindings
 from interface.theater import Theater
 from interface.stage import Stage
 from helpers.instrument import Instrument
@@ -10,34 +11,86 @@ STAGE_SIZE = 8          # Number of cells in a border of a square stage
 TEMPO = 40              # Tempo in BPM
 OSC_URL = '127.0.0.1'   # IP address where to send OSC messages
 OSC_PORT = 57120        # Port where to send OSC messages
+OSC_QUEUE = 256         # Number of OSC datagrams that may wait to be sent during a live performance
+SCSYNTH_PORT = 57110    # Port where to send notes when they are sent straight to SuperCollider server
 
-# Starts a LPD8 as MIDI device
-lpd8 = LPD8()
+# Synth definition and parameters of each instrument when notes are sent straight to SuperCollider server
+SYNTHS = {
+    'xylophone': ('simple_osc', {'vol': 0.05}),
+    'bass': ('simple_osc', {'vol': 0.1}),
+}
+SEED = 3578             # Seed of random births
+LPD8_PROGRAM = 3        # Program of LPD8 whose knobs and pads change parameters while playing
+SCALES = ('MAJOR PENTATONIC', 'MINOR PENTATONIC', 'DORIAN', 'HIRAJOSHI', 'WHOLE TONE')  # Scales picked by knob
 
-# Prepare the main window, also called the theater
-theater = Theater(THEATER_WIDTH, THEATER_HEIGHT, TEMPO * (STAGE_SIZE - 1), midi=lpd8)
+def build_stage(size=STAGE_SIZE, seed=SEED, engine=None, osc_queue=0, scsynth=False, memoize=False):
+    """
+    Build the stage of this performance, with its instruments and scales
+    Shared by the live performance and the headless runner
+    :param size: number of cells in a border of the square stage
+    :param seed: a number used to seed random values
+    :param engine: how cells are moved - None or 'vector'
+    :param osc_queue: size of queue of notes sent by a background thread, 0 to send notes at once
+    :param scsynth: if True, notes are sent straight to SuperCollider server instead of sclang
+    :param memoize: if True, cycles of stage are replayed from records instead of being computed
+    :return: a Stage object
+    """
 
-# Prepare the stage
-stage = Stage(2, 2, THEATER_HEIGHT - 4, STAGE_SIZE, OSC_URL, OSC_PORT, seed=3578)
+    # Prepare the stage
+    if scsynth:
+        stage = Stage(2, 2, THEATER_HEIGHT - 4, size, OSC_URL, SCSYNTH_PORT, osc_queue=osc_queue, osc_synths=SYNTHS,
+                      seed=seed, engine=engine, memoize=memoize)
+    else:
+        stage = Stage(2, 2, THEATER_HEIGHT - 4, size, OSC_URL, OSC_PORT, osc_queue=osc_queue, seed=seed,
+                      engine=engine, memoize=memoize)
 
-# Build two instruments
-xylophone = Instrument('xylophone', 6, 0, 6, motion='RIGHT')
-bass = Instrument('bass', 2, 0, 20)
+    # Build two instruments
+    xylophone = Instrument('xylophone', 6, 0, 6, motion='RIGHT')
+    bass = Instrument('bass', 2, 0, 20)
 
-# Prepare two scales
-major_penta_x = Scale('MAJOR PENTATONIC',60, STAGE_SIZE)
-major_penta_b = Scale('IONIAN',43, STAGE_SIZE)
+    # Prepare two scales
+    major_penta_x = Scale('MAJOR PENTATONIC',60, size)
+    major_penta_b = Scale('IONIAN',43, size)
 
-# Add scales to instruments
-xylophone.set_scale(major_penta_x)
-bass.set_scale(major_penta_b)
+    # Add scales to instruments
+    xylophone.set_scale(major_penta_x)
+    bass.set_scale(major_penta_b)
 
-# Add instruments to stage
-stage.add_instrument(xylophone)
-stage.add_instrument(bass)
+    # Add instruments to stage
+    stage.add_instrument(xylophone)
+    stage.add_instrument(bass)
+    return stage
 
-# Add stage to theater
-theater.add_stage(stage)
+def build_bindings():
+    """
+    Bind knobs of first bank of LPD8 to parameters of this performance - tempo, then birth rate, maximum number of
+    cells and base note of xylophone and of bass, and scale of xylophone - first pad setting back scale of xylophone
+    :return: a Bindings object
+    """
 
-# Start playing !!!
-theater.start_performance()
\ No newline at end of file
+    bindings = Bindings()
+    tempo = TEMPO * (STAGE_SIZE - 1)
+    bindings.bind_knob(LPD8_PROGRAM, 0, 1, 'tempo', tempo / 4, tempo * 4, smoothing=0.8)
+    bindings.bind_knob(LPD8_PROGRAM, 0, 2, 'birth_rate', 1, 24, instrument=0)
+    bindings.bind_knob(LPD8_PROGRAM, 0, 3, 'max_cells', 1, 16, instrument=0)
+    bindings.bind_knob(LPD8_PROGRAM, 0, 4, 'base', 48, 72, instrument=0)
+    bindings.bind_knob(LPD8_PROGRAM, 0, 5, 'scale', instrument=0, choices=SCALES)
+    bindings.bind_knob(LPD8_PROGRAM, 0, 6, 'birth_rate', 1, 40, instrument=1)
+    bindings.bind_knob(LPD8_PROGRAM, 0, 7, 'max_cells', 1, 8, instrument=1)
+    bindings.bind_knob(LPD8_PROGRAM, 0, 8, 'base', 31, 55, instrument=1)
+    bindings.bind_pad(LPD8_PROGRAM, 0, 36, 'scale', SCALES[0], instrument=0)
+    return bindings
+
+if __name__ == '__main__':
+
+    # Starts a LPD8 as MIDI device
+    lpd8 = LPD8()
+
+    # Prepare the main window, also called the theater, its parameters being changed by LPD8 while playing
+    theater = Theater(THEATER_WIDTH, THEATER_HEIGHT, TEMPO * (STAGE_SIZE - 1), midi=lpd8, bindings=build_bindings())
+
+    # Add stage to theater
+    theater.add_stage(build_stage(osc_queue=OSC_QUEUE))
+
+    # Start playing !!!
+    theater.start_performance()
@@ -0,0 +1,28 @@
+import argparse
+from interface.recorder import Recording
+from interface.theater import Theater
+from main import build_stage, THEATER_WIDTH, THEATER_HEIGHT, OSC_QUEUE
+
+# Replays a performance recorded to a log, in real time, sending its notes over OSC and drawing its stages
+# Nothing is computed - notes and states of cells are read from the log, stages being built like the recorded ones
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay a BoInG! performance recorded to a log')
+    parser.add_argument('log', help='log written by a Recorder')
+    parser.add_argument('--start', type=int, default=0, help='tick where to start')
+    parser.add_argument('--headless', action='store_true', help='only send notes, without window')
+    parser.add_argument('--lookahead', type=float, default=0.0, help='seconds ticks are read ahead of time')
+    args = parser.parse_args()
+
+    # Prepare theater with stages of log, at tempo of log
+    recording = Recording(args.log)
+    header = recording.get_header()
+    theater = Theater(THEATER_WIDTH, THEATER_HEIGHT, header['tempo'], headless=args.headless,
+                      lookahead=args.lookahead, replay=recording)
+    for stage in header['stages']:
+        theater.add_stage(build_stage(stage['size'], osc_queue=OSC_QUEUE))
+    theater.seek(args.start)
+
+    # Play log until its end
+    theater.start_performance()
+    recording.close()
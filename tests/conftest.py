@@ -0,0 +1,25 @@
+import pytest
+from interface.stage import Stage
+from helpers.instrument import Instrument
+from helpers.scale import Scale
+
+# Instruments of stages built by tests, as (max cells, first birth, birth rate, motion) tuples
+INSTRUMENTS = [(6, 0, 6, 'RIGHT'), (2, 0, 20, 'UP')]
+
+def make_stage(size=8, seed=3578, instruments=INSTRUMENTS, engine=None, memoize=False, stage=None):
+    # Build a stage that is never drawn nor played, or add instruments to a stage already built with given size
+
+    if stage is None:
+        stage = Stage(0, 0, 400, size, '127.0.0.1', 57120, seed=seed, engine=engine, memoize=memoize)
+    for number, (max_cells, first_birth, birth_rate, motion) in enumerate(instruments):
+        instrument = Instrument('instrument%d' % number, max_cells, first_birth, birth_rate, motion=motion,
+                                color=(255, 255, 255))
+        instrument.set_scale(Scale('MAJOR', 40 + number, size))
+        stage.add_instrument(instrument)
+    return stage
+
+@pytest.fixture
+def build_stage():
+    # Give tests a function building stages - size, seed, instruments, engine, memoize and stage to fill are optional
+
+    return make_stage
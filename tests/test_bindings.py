@@ -0,0 +1,160 @@
+import pygame
+import pytest
+from interface.bindings import Bindings
+from interface.lpd8 import LPD8_Events
+
+# Changes asked for by controller events are applied to a theater standing in for the real one, tick after tick
+
+class Fake_stage:
+    """
+    Class standing in for a stage, keeping parameters of its instruments
+    """
+
+    def __init__(self, parameters):
+        """
+        Class constructor
+        :param parameters: a list of dictionaries of parameters, one per instrument
+        """
+
+        self.parameters = parameters
+
+    def get_parameter(self, instrument, parameter):
+        """
+        Get a parameter of an instrument
+        """
+
+        return self.parameters[instrument][parameter]
+
+class Fake_theater:
+    """
+    Class standing in for a theater, keeping tempo and stages
+    """
+
+    def __init__(self, tempo, stages):
+        """
+        Class constructor
+        """
+
+        self.tempo = tempo
+        self.stages = stages
+
+    def get_tempo(self):
+        """
+        Get tempo
+        """
+
+        return self.tempo
+
+    def get_stages(self):
+        """
+        Get stages
+        """
+
+        return self.stages
+
+    def apply(self, changes):
+        """
+        Apply changes given by bindings
+        """
+
+        for stage, instrument, parameter, value in changes:
+            if parameter == 'tempo':
+                self.tempo = value
+            else:
+                self.stages[stage].parameters[instrument][parameter] = value
+
+@pytest.fixture
+def theater():
+    # Give a theater with a stage of two instruments
+
+    return Fake_theater(396, [Fake_stage([{'birth_rate': 6, 'max_cells': 6, 'scale': 'MAJOR', 'base': 40},
+                                          {'birth_rate': 20, 'max_cells': 2, 'scale': 'MAJOR', 'base': 41}])])
+
+def knob(knob, value, program=3, bank=0):
+    # Build a knob event
+
+    return pygame.event.Event(LPD8_Events.LPD8_CTRL, pgm=program, bank=bank, ctrl=knob, value=value)
+
+def pad(note, program=3, bank=0):
+    # Build a pad event
+
+    return pygame.event.Event(LPD8_Events.LPD8_NOTE_ON, pgm=program, bank=bank, note=note, velocity=100)
+
+def run(bindings, theater, ticks):
+    # Get changes of a number of ticks, applying them to theater
+
+    changes = []
+    for tick in range(ticks):
+        changes.append(bindings.get_changes(theater))
+        theater.apply(changes[-1])
+    return changes
+
+def test_knobs_spread_between_low_and_high(theater):
+    bindings = Bindings()
+    bindings.bind_knob(3, 0, 1, 'tempo', 100, 900)
+    bindings.bind_knob(3, 0, 2, 'base', 30, 60, instrument=1)
+    bindings.bind_knob(3, 0, 3, 'scale', choices=['MAJOR', 'MINOR', 'BLUES', 'PENTATONIC'])
+
+    # Tempo is not rounded, base is a whole number, choices split knob range evenly
+    for event in (knob(1, 64), knob(2, 64), knob(3, 95)):
+        assert bindings.handle(event)
+    assert bindings.get_changes(theater) == [(None, None, 'tempo', 100 + 800 * 64 / 127),
+                                             (0, 1, 'base', 45),
+                                             (0, 0, 'scale', 'BLUES')]
+    for event in (knob(1, 0), knob(2, 127), knob(3, 127)):
+        bindings.handle(event)
+    assert bindings.get_changes(theater) == [(None, None, 'tempo', 100),
+                                             (0, 1, 'base', 60),
+                                             (0, 0, 'scale', 'PENTATONIC')]
+    assert bindings.get_stats() == {'events': 6, 'changes': 6, 'pending': 0}
+
+def test_latest_event_wins_and_unchanged_values_are_left_out(theater):
+    bindings = Bindings()
+    bindings.bind_knob(3, 0, 1, 'max_cells', 1, 128)
+    bindings.bind_pad(3, 0, 36, 'birth_rate', 6)
+    bindings.bind_pad(3, 0, 37, 'birth_rate', 12)
+    for event in (knob(1, 10), knob(1, 9), pad(36), pad(37), pad(36)):
+        assert bindings.handle(event)
+
+    # Birth rate asked for is already set, so only maximum number of cells changes
+    assert bindings.get_changes(theater) == [(0, 0, 'max_cells', 10)]
+    assert bindings.get_changes(theater) == []
+
+    # Events not bound are left to others
+    assert not bindings.handle(knob(2, 10))
+    assert not bindings.handle(knob(1, 10, bank=1))
+    assert not bindings.handle(pad(38))
+    assert not bindings.handle(pygame.event.Event(LPD8_Events.LPD8_NOTE_OFF, pgm=3, bank=0, note=36))
+    assert bindings.get_stats() == {'events': 5, 'changes': 1, 'pending': 0}
+
+def test_unknown_parameter():
+    with pytest.raises(ValueError):
+        Bindings().bind_knob(3, 0, 1, 'volume')
+
+def test_smoothed_tempo_moves_part_of_the_way(theater):
+    bindings = Bindings()
+    bindings.bind_knob(3, 0, 1, 'tempo', 0, 1270, smoothing=0.5)
+    bindings.handle(knob(1, 50))
+    changes = run(bindings, theater, 12)
+
+    # Tempo halves distance to 500 at each tick, snapping to it once less than half a tick per minute away
+    tempos = [tick_changes[0][3] for tick_changes in changes if tick_changes]
+    assert tempos == [448, 474, 487, 493.5, 496.75, 498.375, 499.1875, 500]
+    assert changes[len(tempos):] == [[]] * (12 - len(tempos))
+    assert bindings.get_stats()['pending'] == 0
+
+def test_smoothed_whole_numbers_move_by_one_at_least(theater):
+    bindings = Bindings()
+    bindings.bind_knob(3, 0, 1, 'max_cells', 0, 127, smoothing=0.5)
+    bindings.bind_knob(3, 0, 2, 'birth_rate', 0, 127, instrument=1, smoothing=0.9)
+    bindings.handle(knob(1, 16))
+    bindings.handle(knob(2, 17))
+    changes = run(bindings, theater, 6)
+    assert [[value for stage, instrument, parameter, value in tick_changes if parameter == 'max_cells']
+            for tick_changes in changes] == [[11], [14], [15], [16], [], []]
+    assert [[value for stage, instrument, parameter, value in tick_changes if parameter == 'birth_rate']
+            for tick_changes in changes] == [[19], [18], [17], [], [], []]
+
+    # A knob turned again while smoothing goes on heads toward its latest value from where parameter stands
+    bindings.handle(knob(1, 13))
+    assert run(bindings, theater, 3) == [[(0, 0, 'max_cells', 14)], [(0, 0, 'max_cells', 13)], []]
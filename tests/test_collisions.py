@@ -0,0 +1,26 @@
+import pytest
+from helpers.cell import Cell
+from interface.stage import Stage
+from helpers.instrument import Instrument
+from helpers.scale import Scale
+
+# Collisions are found from positions of cells - on stages wider than 100 cells, positions (0, 100) and (1, 0) used to
+# share the same collision number
+
+@pytest.mark.parametrize('engine', [None, 'vector'])
+@pytest.mark.parametrize('size', [101, 128, 250])
+def test_collisions_on_wide_stages(size, engine):
+    stage = Stage(0, 0, 400, size, '127.0.0.1', 57120, seed=1, engine=engine)
+    instrument = Instrument('wide', 4, 10000, 10000, color=(255, 255, 255))
+    instrument.set_scale(Scale('MAJOR', 40, size))
+
+    # First two cells keep apart on aliased positions, last two meet halfway
+    for line, col, motion in [(0, 100, 'DOWN'), (1, 0, 'DOWN'), (5, 5, 'RIGHT'), (5, 7, 'LEFT')]:
+        instrument.add_cell(Cell(line, col, motion))
+    stage.add_instrument(instrument)
+    stage.next_tick(False)
+
+    line, col, flash, collide, _ = stage.get_snapshot()
+    colliding = sorted((cell_line, cell_col) for cell_line, cell_col, cell_collide
+                       in zip(line.tolist(), col.tolist(), collide.tolist()) if cell_collide)
+    assert colliding == [(5, 6), (5, 6)]
@@ -0,0 +1,111 @@
+import os
+import time
+import pytest
+import pygame
+from pygame import midi
+from interface.lpd8 import LPD8, LPD8_Events
+
+# MIDI input is replaced by a list of messages the reader thread takes from, events posted being read back from pygame
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+class Fake_input:
+    """
+    Class standing in for MIDI input of LPD8, giving back messages appended to it
+    """
+
+    def __init__(self, device_id, buffer_size):
+        """
+        Class constructor
+        """
+
+        self.messages = []
+        self.closed = False
+
+    def poll(self):
+        """
+        Tell if messages are waiting
+        """
+
+        return bool(self.messages)
+
+    def read(self, count):
+        """
+        Take a number of messages at most
+        """
+
+        read, self.messages = self.messages[:count], self.messages[count:]
+        return read
+
+    def close(self):
+        """
+        Close input
+        """
+
+        self.closed = True
+
+@pytest.fixture
+def lpd8(monkeypatch):
+    # Give an LPD8 reading from a fake MIDI input, with pygame event queue empty
+
+    monkeypatch.setattr(midi, 'init', lambda: None)
+    monkeypatch.setattr(midi, 'get_count', lambda: 0)
+    monkeypatch.setattr(midi, 'Input', Fake_input)
+    pygame.display.init()
+    pygame.event.clear()
+    lpd8 = LPD8()
+    yield lpd8
+    lpd8.close()
+    pygame.display.quit()
+
+def feed(lpd8, messages):
+    # Hand MIDI messages to reader thread and wait until it has read them all
+
+    read = lpd8.get_stats()['read'] + len(messages)
+    lpd8._lpd8_in.messages.extend(messages)
+    deadline = time.monotonic() + 1.0
+    while lpd8.get_stats()['read'] < read and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert lpd8.get_stats()['read'] == read
+
+def get_events():
+    # Get LPD8 events posted, as (event type, attributes) tuples
+
+    return [(event.type, event.dict) for event in pygame.event.get() if event.type >= LPD8_Events.LPD8_PGM_CHG]
+
+def test_knobs_are_coalesced_and_pads_keep_their_order(lpd8):
+
+    # Knob 1 sweeps up and knob 2 down, on program 3, pads being hit in between
+    messages = []
+    for step in range(20):
+        messages.append([[176 + 3, 1, 63 + step, 0], 2 * step])
+        messages.append([[176 + 3, 2, 63 - step, 0], 2 * step + 1])
+    messages[10:10] = [[[144 + 3, 36, 100, 0], 100], [[144 + 3, 37, 90, 0], 101], [[128 + 3, 36, 0, 0], 102]]
+    messages.append([[128 + 3, 37, 0, 0], 103])
+    feed(lpd8, messages)
+    lpd8.get_messages()
+
+    # Pads come first in order they were hit, then latest value of each knob with its timestamp
+    assert get_events() == [
+        (LPD8_Events.LPD8_NOTE_ON, {'pgm': 3, 'bank': 0, 'note': 36, 'velocity': 100, 'time': 100}),
+        (LPD8_Events.LPD8_NOTE_ON, {'pgm': 3, 'bank': 0, 'note': 37, 'velocity': 90, 'time': 101}),
+        (LPD8_Events.LPD8_NOTE_OFF, {'pgm': 3, 'bank': 0, 'note': 36, 'time': 102}),
+        (LPD8_Events.LPD8_NOTE_OFF, {'pgm': 3, 'bank': 0, 'note': 37, 'time': 103}),
+        (LPD8_Events.LPD8_CTRL, {'pgm': 3, 'bank': 0, 'ctrl': 1, 'value': 82, 'time': 38}),
+        (LPD8_Events.LPD8_CTRL, {'pgm': 3, 'bank': 0, 'ctrl': 2, 'value': 44, 'time': 39}),
+    ]
+    assert lpd8.get_stats() == {'read': 44, 'posted': 6, 'coalesced': 38, 'waiting': 0}
+
+def test_program_change_sets_bank_of_next_events(lpd8):
+    feed(lpd8, [[[192 + 1, 4, 0, 0], 0], [[176 + 1, 5, 64, 0], 1], [[144 + 1, 40, 127, 0], 2]])
+    lpd8.get_messages()
+    assert get_events() == [
+        (LPD8_Events.LPD8_PGM_CHG, {'pgm': 1, 'bank': 4, 'time': 0}),
+        (LPD8_Events.LPD8_NOTE_ON, {'pgm': 1, 'bank': 4, 'note': 40, 'velocity': 127, 'time': 2}),
+        (LPD8_Events.LPD8_CTRL, {'pgm': 1, 'bank': 4, 'ctrl': 5, 'value': 64, 'time': 1}),
+    ]
+
+    # Knob values already posted are not posted again on next frame
+    lpd8.get_messages()
+    assert get_events() == []
+    assert lpd8.get_stats()['coalesced'] == 0
@@ -0,0 +1,122 @@
+import socket
+import struct
+import threading
+import pytest
+from pythonosc.osc_bundle import OscBundle
+from pythonosc.osc_message import OscMessage
+from interface.osc_client import Osc_client
+
+# A local UDP socket stands in for the synthesiser, datagrams it receives being decoded as OSC messages and bundles
+
+@pytest.fixture
+def receiver():
+    # Give a UDP socket bound to a free local port
+
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(('127.0.0.1', 0))
+    receiver.settimeout(1.0)
+    yield receiver
+    receiver.close()
+
+def receive(receiver, count):
+    # Receive a number of datagrams
+
+    return [receiver.recv(65536) for datagram in range(count)]
+
+class Stalled_socket:
+    """
+    Class standing in for the socket of a client, sending being stalled until released, to fill sending queue
+    """
+
+    def __init__(self):
+        """
+        Class constructor
+        """
+
+        self.sent = []
+        self.sending = threading.Event()
+        self.released = threading.Event()
+
+    def sendto(self, datagram, address):
+        """
+        Wait until released, then keep datagram
+        """
+
+        self.sending.set()
+        self.released.wait()
+        self.sent.append(datagram)
+
+def test_s_new_commands(receiver):
+    client = Osc_client('127.0.0.1', receiver.getsockname()[1], synths={'bass': ('boing', {'vol': 0.25, 'pan': -0.5})})
+    client.send('bass', [40, 52])
+    client.send('lead', [60])
+    client.send('bass', [40])
+    messages = [OscMessage(datagram) for datagram in receive(receiver, 4)]
+
+    # Node ids count up from 1000, also for commands taken from cache
+    assert [message.address for message in messages] == ['/s_new'] * 4
+    assert [message.params for message in messages] == [
+        ['boing', 1000, 0, 0, 'midinote', 40, 'vol', 0.25, 'pan', -0.5],
+        ['boing', 1001, 0, 0, 'midinote', 52, 'vol', 0.25, 'pan', -0.5],
+        ['simple_osc', 1002, 0, 0, 'midinote', 60, 'vol', pytest.approx(0.1)],
+        ['boing', 1003, 0, 0, 'midinote', 40, 'vol', 0.25, 'pan', -0.5],
+    ]
+    assert client.get_cache_stats() == {'size': 3, 'hits': 1, 'misses': 3}
+    assert client.is_scsynth()
+
+def test_bundles_split_to_fit_datagrams(receiver):
+    client = Osc_client('127.0.0.1', receiver.getsockname()[1])
+    messages = [('instrument%d' % number, list(range(number % 7 + 1))) for number in range(120)]
+    client.send_bundle(messages)
+    sent = client.get_transport_stats()['sent']
+    bundles = receive(receiver, sent)
+
+    # Bundles hold all messages in order, none being bigger than an Ethernet frame
+    assert sent > 1
+    assert all(len(bundle) <= 1472 for bundle in bundles)
+    received = [(message.address, message.params) for bundle in bundles for message in OscBundle(bundle)]
+    assert received == [('/' + url, notes) for url, notes in messages]
+
+def test_bundle_timetags(receiver):
+    client = Osc_client('127.0.0.1', receiver.getsockname()[1])
+    timetag = 1700000000 * 1000000000 + 250000000
+    client.send_bundle([('bass', [40])], timetag)
+    client.send_bundle([('bass', [40])])
+    stamped, immediate = receive(receiver, 2)
+
+    # NTP time counts seconds from 1900, and fractions of second in 1 / 2 ** 32 units
+    assert struct.unpack('>II', stamped[8:16]) == (1700000000 + 2208988800, 2 ** 30)
+    assert struct.unpack('>II', immediate[8:16]) == (0, 1)
+
+def test_message_cache_is_least_recently_used(receiver):
+    client = Osc_client('127.0.0.1', receiver.getsockname()[1], cache_size=2)
+    for url, notes in [('a', [1]), ('b', [2]), ('a', [1]), ('c', [3]), ('b', [2]), ('c', [3])]:
+        client.send(url, notes)
+    assert client.get_cache_stats() == {'size': 2, 'hits': 2, 'misses': 4}
+    assert [OscMessage(datagram).address for datagram in receive(receiver, 6)] == ['/a', '/b', '/a', '/c', '/b', '/c']
+
+@pytest.mark.parametrize('overflow, kept, dropped', [
+    ('drop_oldest', [0, 3, 4], 2),
+    ('drop_newest', [0, 1, 2], 2),
+    ('block', [0, 1, 2, 3, 4], 0),
+])
+def test_queue_overflow(overflow, kept, dropped):
+    client = Osc_client(queue_size=2, overflow=overflow)
+    stalled = client._socket = Stalled_socket()
+
+    # First message is taken by sending thread and stalled, next ones fill queue
+    client.send('m', [0])
+    assert stalled.sending.wait(1.0)
+    sender = threading.Thread(target=lambda: [client.send('m', [number]) for number in range(1, 5)])
+    sender.start()
+    sender.join(0.2)
+    assert sender.is_alive() == (overflow == 'block')
+    stalled.released.set()
+    sender.join()
+    client.close()
+
+    assert [OscMessage(datagram).params[0] for datagram in stalled.sent] == kept
+    stats = client.get_transport_stats()
+    assert stats['dropped'] == dropped
+    assert stats['sent'] == len(kept)
+    assert stats['max_depth'] == 2
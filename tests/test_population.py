@@ -0,0 +1,73 @@
+import random
+from helpers.cell import Cell
+from helpers.population import Population
+
+# Population is checked against a plain list of cells, free birth positions being found by scanning the whole grid
+
+MOTIONS = ['UP', 'DOWN', 'LEFT', 'RIGHT']
+
+def free_positions(cells, size):
+    # Get free birth positions by scanning the grid, sorted by line then column
+
+    occupied = {(cell.get_line(), cell.get_col()) for cell in cells}
+    return [(line, col) for line in range(size - 1) for col in range(size - 1) if (line, col) not in occupied]
+
+def check(population, cells, size):
+    # Check population holds given cells, from oldest to youngest, and indexes free positions like a full scan
+
+    assert list(population) == cells
+    free = free_positions(cells, size)
+    assert population.count_free() == len(free)
+    assert [population.get_free(index) for index in range(len(free))] == free
+    for line in range(size):
+        for col in range(size):
+            expected = any(cell.get_line() == line and cell.get_col() == col for cell in cells)
+            assert population.is_occupied(line, col) == expected
+
+def test_ring_buffer_expires_oldest_cells():
+    population = Population(3)
+    population.set_size(8)
+    cells = [Cell(index, index, 'UP', 8) for index in range(5)]
+    expired = [population.append(cell) for cell in cells]
+    assert expired == [None, None, None, cells[0], cells[1]]
+    check(population, cells[2:], 8)
+
+def test_free_positions_follow_moves_and_births():
+    size = 9
+    generator = random.Random(3)
+    population = Population(20)
+    population.set_size(size)
+    cells = []
+    for tick in range(200):
+        population.move()
+        if population.count_free():
+            line, col = population.get_free(generator.randrange(population.count_free()))
+            assert (line, col) in free_positions(cells, size)
+            cell = Cell(line, col, generator.choice(MOTIONS), size)
+            expired = population.append(cell)
+            cells.append(cell)
+            if expired is not None:
+                assert expired is cells.pop(0)
+        check(population, cells, size)
+
+def test_colliding_cells():
+    population = Population(4)
+    population.set_size(6)
+    cells = [Cell(2, 2, 'UP', 6), Cell(3, 3, 'UP', 6), Cell(2, 2, 'LEFT', 6), Cell(0, 4, 'UP', 6)]
+    for cell in cells:
+        population.append(cell)
+    assert list(population.get_colliding()) == [cells[0], cells[2]]
+
+def test_full_grid_and_capacity_change():
+    size = 4
+    population = Population(16)
+    population.set_size(size)
+    cells = [Cell(line, col, 'STILL', size) for line in range(size - 1) for col in range(size - 1)]
+    for cell in cells:
+        population.append(cell)
+    check(population, cells, size)
+    assert population.count_free() == 0
+    population.set_capacity(4)
+    check(population, cells[-4:], size)
+    population.set_size(6)
+    check(population, cells[-4:], 6)
@@ -0,0 +1,211 @@
+import pygame
+import pytest
+from interface.bindings import Bindings
+from interface.lpd8 import LPD8_Events
+from interface.recorder import Recorder, Recording, _read_varint, _write_varint
+from interface.theater import Theater
+
+# Logs are written from a stage stepped tick after tick, then read back and compared with what was recorded
+
+def record(recorder, stage, start, ticks):
+    # Record ticks of stage, a controller event being heard before every seventh tick
+    # Returns records as a Recording gives them back
+
+    records = []
+    for tick in range(start, start + ticks):
+        controls = []
+        if tick % 7 == 0:
+            controls.append((3, 0, 1, tick % 8, tick % 128))
+            recorder.add_control(*controls[-1])
+        instruments = stage.get_instruments()
+        notes = [(instruments.index(instrument), instrument_notes)
+                 for instrument, instrument_notes in stage.next_tick(False)]
+        snapshot = stage.get_snapshot()
+        recorder.add_tick(tick, [(stage.get_births(), notes, snapshot)])
+        records.append((tick, controls, [(stage.get_births(), notes, snapshot)]))
+    return records
+
+def same(record, expected):
+    # Tell if a record read from a log is the one expected, snapshots holding NumPy arrays
+
+    tick, controls, stages = record
+    expected_tick, expected_controls, expected_stages = expected
+    if tick != expected_tick or controls != expected_controls:
+        return False
+    for (births, notes, snapshot), (expected_births, expected_notes, expected_snapshot) in zip(stages,
+                                                                                            expected_stages):
+        if births != expected_births or notes != expected_notes:
+            return False
+        if [array.tolist() for array in snapshot] != [array.tolist() for array in expected_snapshot]:
+            return False
+    return True
+
+def read_all(recording):
+    # Read all ticks left in a log
+
+    records = []
+    record = recording.next_tick()
+    while record is not None:
+        records.append(record)
+        record = recording.next_tick()
+    return records
+
+def test_varint_round_trip():
+    data = bytearray()
+    values = [0, 1, 0x7F, 0x80, 300, 0x3FFF, 0x4000, 2 ** 40, 2 ** 63 - 1]
+    for value in values:
+        _write_varint(data, value)
+    offset = 0
+    for value in values:
+        read, offset = _read_varint(data, offset)
+        assert read == value
+    assert offset == len(data)
+
+def test_log_round_trip(tmp_path, build_stage):
+    path = str(tmp_path / 'boing.log')
+    stage = build_stage()
+    recorder = Recorder(path, [stage], 396, index_interval=50)
+    records = record(recorder, stage, 0, 420)
+    recorder.close()
+    assert recorder.get_stats()['ticks'] == 420
+
+    recording = Recording(path)
+    assert recording.get_header()['tempo'] == 396
+    assert [tick for tick, offset in recording.get_index()] == list(range(0, 420, 50))
+    read = read_all(recording)
+    recording.close()
+    assert len(read) == len(records)
+    assert all(same(record, expected) for record, expected in zip(read, records))
+
+@pytest.mark.parametrize('tick', [0, 1, 49, 50, 51, 199, 419])
+def test_seek_through_index(tmp_path, tick, build_stage):
+    path = str(tmp_path / 'boing.log')
+    stage = build_stage()
+    recorder = Recorder(path, [stage], 396, index_interval=50)
+    records = record(recorder, stage, 0, 420)
+    recorder.close()
+
+    # Controller events heard before tick sought are skipped
+    recording = Recording(path)
+    recording.seek(tick)
+    read = read_all(recording)
+    recording.close()
+    expected = records[tick:]
+    assert len(read) == len(expected)
+    assert same((read[0][0], [], read[0][2]), (expected[0][0], [], expected[0][2]))
+    assert all(same(record, expected) for record, expected in zip(read[1:], expected[1:]))
+
+def test_extended_log_goes_on_after_last_tick(tmp_path, build_stage):
+    path = str(tmp_path / 'boing.log')
+    stage = build_stage()
+    recorder = Recorder(path, [stage], 396, index_interval=50)
+    records = record(recorder, stage, 0, 120)
+
+    # Controller events heard after last tick are kept and heard before next tick recorded
+    recorder.add_control(1, 0, 2, 36, 100)
+    recorder.close()
+
+    recorder = Recorder(path, [build_stage()], 396, index_interval=50)
+    assert recorder.get_next_tick() == 120
+    with pytest.raises(ValueError):
+        recorder.add_tick(119, [([], [], None)])
+    records += record(recorder, stage, 120, 80)
+    records[120][1].insert(0, (1, 0, 2, 36, 100))
+    recorder.close()
+
+    recording = Recording(path)
+    read = read_all(recording)
+    recording.close()
+    assert [record[0] for record in read] == list(range(200))
+    assert all(same(record, expected) for record, expected in zip(read, records))
+
+def test_unfinished_block_is_cut_off(tmp_path, build_stage):
+    path = str(tmp_path / 'boing.log')
+    stage = build_stage()
+    recorder = Recorder(path, [stage], 396, index_interval=50)
+    records = record(recorder, stage, 0, 120)
+    recorder.close()
+    with open(path, 'r+b') as log:
+        log.truncate(recorder.get_stats()['bytes'] - 3)
+
+    recorder = Recorder(path, [build_stage()], 396, index_interval=50)
+    assert recorder.get_next_tick() == 100
+    recorder.close()
+    recording = Recording(path)
+    read = read_all(recording)
+    recording.close()
+    assert all(same(record, expected) for record, expected in zip(read, records[:100]))
+    assert len(read) == 100
+
+def test_log_of_another_performance_is_not_extended(tmp_path, build_stage):
+    path = str(tmp_path / 'boing.log')
+    Recorder(path, [build_stage()], 396).close()
+    with pytest.raises(ValueError):
+        Recorder(path, [build_stage()], 120)
+
+def test_tempo_changes_are_replayed(tmp_path, build_stage):
+    path = str(tmp_path / 'boing.log')
+    stage = build_stage()
+    recorder = Recorder(path, [stage], 396, index_interval=50)
+    tempos = []
+    tempo = 396
+    for tick in range(200):
+        if tick % 30 == 10:
+            tempo += 12.5
+            recorder.add_tempo(tempo)
+        tempos.append(tempo)
+        record(recorder, stage, tick, 1)
+    recorder.close()
+
+    recording = Recording(path)
+    read = []
+    while recording.next_tick() is not None:
+        read.append(recording.get_tempo())
+    assert read == tempos
+
+    # Blocks start at tempo of their first tick, so seeking finds tempo in effect
+    for tick in (0, 10, 49, 50, 120, 199):
+        recording.seek(tick)
+        assert recording.get_tempo() == tempos[tick]
+    recording.close()
+
+    # An extended log goes on at its last tempo
+    recorder = Recorder(path, [build_stage()], 396, index_interval=50)
+    record(recorder, stage, 200, 60)
+    recorder.close()
+    recording = Recording(path)
+    recording.seek(230)
+    assert recording.get_tempo() == tempo
+    recording.close()
+
+def test_replay_follows_tempo_knob(tmp_path, build_stage):
+    path = str(tmp_path / 'boing.log')
+    stage = build_stage()
+    bindings = Bindings()
+    bindings.bind_knob(3, 0, 1, 'tempo', 100, 900, smoothing=0.5)
+    theater = Theater(400, 400, 396, headless=True, recorder=Recorder(path, [stage], 396, index_interval=50),
+                      bindings=bindings)
+    theater.add_stage(stage)
+    tempos = []
+    for tick in range(150):
+        if tick in (20, 90):
+            event = pygame.event.Event(LPD8_Events.LPD8_CTRL, pgm=3, bank=0, ctrl=1, value=tick)
+            theater._record_event(event)
+            bindings.handle(event)
+        list(theater.run(1))
+        tempos.append(theater.get_tempo())
+    theater._close()
+    assert len(set(tempos)) > 2
+
+    # Replayed theater has no bindings, tempo changes being read from log
+    recording = Recording(path)
+    theater = Theater(400, 400, 396, headless=True, replay=recording)
+    theater.add_stage(build_stage())
+    replayed = []
+    for tick in range(150):
+        list(theater.run(1))
+        replayed.append(theater.get_tempo())
+    assert replayed == tempos
+    theater.seek(100)
+    assert theater.get_tempo() == tempos[100]
+    recording.close()
@@ -0,0 +1,28 @@
+from time import sleep, time_ns
+from interface.scheduler import Scheduler
+
+# Deadlines given as wall clock time must stay on the same timeline as the schedule itself, whenever it is moved
+
+def test_wall_time_follows_restart():
+    scheduler = Scheduler(600, max_lateness=0.05)
+    scheduler.start()
+    assert scheduler.poll() == 0
+    sleep(0.3)
+    tick = scheduler.poll()
+    assert tick == 1
+    assert scheduler.get_stats()['restarts'] == 1
+
+    # Restarted tick is due now, not when it was due before suspension
+    assert abs(scheduler.get_wall_time(tick) - time_ns()) < 20000000
+
+def test_wall_time_follows_tempo_change():
+    scheduler = Scheduler(6000)
+    scheduler.start()
+    assert scheduler.poll() == 0
+    due = scheduler.get_wall_time(1)
+    scheduler.set_tempo(3000)
+
+    # Next tick stays due at the same time, following ones at new tempo, on both clocks
+    assert scheduler.get_wall_time(1) == due
+    assert scheduler.get_wall_time(2) - due == scheduler.get_period() == 20000000
+    assert scheduler.get_wall_time(2) - scheduler.get_deadline(2) == due - scheduler.get_deadline(1)
@@ -0,0 +1,67 @@
+import pytest
+from interface.stage import Stage
+
+# Stages skipping work - replaying cycles or seeking - are checked against the reference path, a stage computing every
+# tick one after another
+
+# Stage configurations, as (size, seed, instruments) tuples, instruments as (max cells, first birth, birth rate, motion)
+CONFIGURATIONS = [
+    (8, 3578, [(6, 0, 6, 'RIGHT'), (2, 0, 20, 'UP')]),
+    (12, 1, [(5, 0, 40, 'DOWN'), (3, 2, 60, 'LEFT')]),
+    (10, 3, [(5, 0, 300, 'UP'), (4, 0, 500, 'RIGHT')]),
+]
+
+ENGINES = [None, 'vector']
+
+def play(stage, ticks):
+    # Play ticks, giving notes by instrument name and state of cells after each tick
+
+    played = []
+    for tick in range(ticks):
+        notes = [(instrument.get_name(), instrument_notes) for instrument, instrument_notes in stage.next_tick(False)]
+        played.append((notes, [array.tolist() for array in stage.get_snapshot()]))
+    return played
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('size, seed, instruments', CONFIGURATIONS)
+def test_memoized_stage_plays_like_reference(size, seed, instruments, engine, build_stage):
+    reference = play(build_stage(size, seed, instruments, engine), 3000)
+    stage = build_stage(size, seed, instruments, engine, memoize=True)
+    assert play(stage, 3000) == reference
+    assert stage.get_cycle_stats()['replayed'] > 0
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_memoized_stage_follows_parameter_changes(engine, build_stage):
+    size, seed, instruments = CONFIGURATIONS[0]
+    stages = [build_stage(size, seed, instruments, engine), build_stage(size, seed, instruments, engine, memoize=True)]
+    played = []
+    for stage in stages:
+        played.append(play(stage, 1500))
+        stage.set_parameter(1, 'birth_rate', 9)
+        stage.set_parameter(0, 'scale', 'HARMONIC MINOR')
+        played[-1].extend(play(stage, 1500))
+    assert played[1] == played[0]
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('size, seed, instruments', CONFIGURATIONS)
+@pytest.mark.parametrize('tick', [0, 1, 37, 1000, 4321])
+def test_seek_lands_on_reference_tick(size, seed, instruments, engine, tick, build_stage):
+    reference = build_stage(size, seed, instruments, engine)
+    for _ in range(tick):
+        reference.next_tick(False)
+    stage = build_stage(size, seed, instruments, engine)
+    stage.seek(tick)
+    assert stage.get_tick() == tick
+    assert play(stage, 300) == play(reference, 300)
+
+def test_seek_cannot_go_back(build_stage):
+    size, seed, instruments = CONFIGURATIONS[0]
+    stage = build_stage(size, seed, instruments)
+    stage.seek(10)
+    with pytest.raises(ValueError):
+        stage.seek(5)
+
+def test_seed_may_be_given_by_position(build_stage):
+    stage = build_stage(stage=Stage(0, 0, 400, 8, '127.0.0.1', 57120, 3578, (255, 0, 0)))
+    assert stage.get_osc_client().get_transport_stats()['depth'] == 0
+    assert play(stage, 500) == play(build_stage(*CONFIGURATIONS[0]), 500)
@@ -0,0 +1,28 @@
+import pytest
+
+# Vectorized engine has to play the very same notes as instruments moving their own cells, for the same seed
+
+# Stage configurations, as (size, seed, instruments) tuples, instruments as (max cells, first birth, birth rate, motion)
+CONFIGURATIONS = [
+    (8, 3578, [(6, 0, 6, 'RIGHT'), (2, 0, 20, 'UP')]),
+    (16, 1, [(30, 0, 1, 'DOWN'), (5, 3, 7, 'LEFT'), (12, 1, 2, 'UP')]),
+    (5, 42, [(8, 0, 3, 'UP'), (4, 1, 5, 'RIGHT')]),
+    (33, 7, [(200, 0, 1, 'RIGHT'), (50, 0, 4, 'DOWN')]),
+]
+
+def play(stage, ticks):
+    # Play ticks, giving notes by instrument name and positions of cells of each instrument after each tick
+
+    played = []
+    for tick in range(ticks):
+        notes = [(instrument.get_name(), instrument_notes) for instrument, instrument_notes in stage.next_tick(False)]
+        line, col, flash, collide, instrument = stage.get_snapshot()
+        cells = sorted(zip(instrument.tolist(), line.tolist(), col.tolist(), flash.tolist(), collide.tolist()))
+        played.append((notes, cells))
+    return played
+
+@pytest.mark.parametrize('size, seed, instruments', CONFIGURATIONS)
+def test_vector_engine_plays_like_instruments(size, seed, instruments, build_stage):
+    reference = play(build_stage(size, seed, instruments), 3000)
+    assert play(build_stage(size, seed, instruments, engine='vector'), 3000) == reference
+    assert any(notes for notes, cells in reference)